@@ -0,0 +1,263 @@
+"""Benchmark del caricamento e dei filtri su fogli STRUTTURE sintetici.
+
+Genera workbook con le stesse colonne del foglio reale (gruppi separati da una
+riga vuota, testo libero vario nelle considerazioni e nelle note) e misura separatamente lettura, compattazione delle colonne, raggruppamento, indici,
+scelte, filtri e popolamento della tabella (Qt offscreen), più i byte occupati da
+colonne e indici. I risultati vanno in JSON:
+
+    python benchmark_strutture.py --righe 1000 10000 100000 --output bench.json
+    python benchmark_strutture.py --righe 10000 --confronta bench_precedente.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import subprocess
+import statistics
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from strutture_dati import StruttureDataset, StruttureQuery, group_ids_from_blank
+
+HEADER = [
+    "DATA", "LUOGO", "TEST o GARA", "ORA INIZIO", "0RA FINE",
+    "TEMP. ARIA INIZIO", "TEMP. ARIA FINE", "TEMP. NEVE INIZIO", "TEMP. NEVE FINE",
+    "UMIDITA % INIZIO", "UMIDITA' % FINE", "CONDIZIONI METEO E VENTO", "TIPO NEVE",
+    "SCI N°", "IMPRONTA", "STRUTTURA", "PARAFFINA E/O ADDITIVO", "STESURA",
+    "SCIOLINA DI TENUTA", "STESURA SCIOLINA", "NOTE", "CONSIDERAZIONE POST GARA o TEST",
+    "OSSERVAZIONI AGGIUNTIVE",
+]
+LUOGHI = ["BIONAZ", "FLASSIN", "COGNE", "BRUSSON", "TORGNON", "SAINT BARTHELEMY", "ARPY",
+          "GRESSONEY", "PRAGELATO", "VALSAVARENCHE", "ANTERSELVA", "DOBBIACO", "LIVIGNO", "TESERO"]
+EVENTI = ["TEST", "TEST LIQUIDO NO FLUORO", "GARA SKATTING", "GARA CLASSICO", "GARA BIATHLON SPRINT"]
+METEO = ["SERENO SENZA VENTO", "SERENO CON VENTO MODERATO", "COPERTO E LEGGERA NEVICATA",
+         "NUVOLOSO CON SCHIARITE", "NEBBIA", "PIOGGIA DEBOLE"]
+NEVE = ["NEVE FRESCA SU NEVE ARTIFICIALE", "COMPATTA + FARINA SUPERFICIALE", "NEVE ARTIFICIALE GRANULARE",
+        "TRASFORMATA UMIDA", "GHIACCIATA", "FARINOSA"]
+IMPRONTE = ["XD2.5", "R1", "SW03", "RU18", "RC5", "RU5"]
+STRUTTURE = ["LGV + LF+", "V103T + V102", "V743 + V102", "LGVRovescio + LF+", "----"]
+PARAFFINE = ["VIOLA MED MAPLUS", "VIOLA MED MAPLUS + LIQUIDO 7H", "MAPLUS ROSSA + LIQUIDO MED"]
+STESURE = ["A CALDO", "A CALDO + SPAZZOLA A RULLO", "A RULLO"]
+CONSIDERAZIONI = [
+    "PRIMA SCELTA, OTTIMA SCORREVOLEZZA", "SECONDA SCELTA", "TERZA SCELTA, PEGGIORE IN SALITA",
+    "BUONA SENSAZIONE IN DISCESA", "DA RIVALUTARE CON TEMPERATURE PIU ALTE", "SIMILE AL PRECEDENTE",
+]
+# Testo libero: parole ricorrenti, nomi inventati da sillabe e numeri, come nelle note vere
+PAROLE = [
+    "SCORREVOLEZZA", "TENUTA", "SPINTA", "SALITA", "DISCESA", "CURVA", "PISTA", "NEVE", "SCI", "STRUTTURA",
+    "PARAFFINA", "LIQUIDO", "VELOCE", "LENTO", "FRENANTE", "ASCIUTTO", "BAGNATO", "GHIACCIO", "SOLE", "OMBRA",
+    "MATTINO", "POMERIGGIO", "ATLETA", "TECNICO", "PROVA", "GIRO", "TRATTO", "PIANO", "RISPETTO", "MIGLIORE",
+    "PEGGIORE", "SIMILE", "LEGGERMENTE", "MOLTO", "POCO", "SENSAZIONE", "RUMORE", "ADERENZA", "SPAZZOLA", "BINARIO",
+]
+SILLABE = ["BA", "CE", "DI", "FO", "GU", "LA", "ME", "NI", "PO", "RU", "SA", "TE", "VI", "ZO", "TRA", "PRE",
+           "SCI", "GNO", "STR", "CLA", "BRU", "KO", "XE", "WA"]
+# Versione del generatore, nel nome dei fogli: un foglio di una versione precedente non si riusa
+GENERATORE = 2
+
+def frase(rng):
+    """Testo libero casuale di qualche parola"""
+    parole = []
+    for _ in range(rng.randint(4, 14)):
+        caso = rng.random()
+        if caso < 0.7:
+            parole.append(rng.choice(PAROLE))
+        elif caso < 0.85:
+            parole.append("".join(rng.choice(SILLABE) for _ in range(rng.randint(2, 4))))
+        else:
+            parole.append(f"{rng.uniform(-15, 5):.1f}")
+    return " ".join(parole)
+
+def genera_workbook(path, righe, seed=0):
+    """Scrive un foglio sintetico di circa `righe` righe, in streaming (openpyxl write_only)"""
+    import openpyxl
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Foglio1")
+    sheet.append(HEADER)
+    giorno = datetime(2015, 11, 1)
+    scritte = 0
+    while scritte < righe:
+        giorno += timedelta(days=rng.randint(1, 3))
+        temp_aria = round(rng.uniform(-15, 8), 1)
+        temp_neve = round(min(temp_aria - rng.uniform(0, 5), 0), 1)
+        umidita = round(rng.uniform(0.3, 0.95), 2)
+        sessione = [giorno, rng.choice(LUOGHI), rng.choice(EVENTI), "10:00:00", "11:30:00",
+                    temp_aria, round(temp_aria + rng.uniform(-1, 3), 1),
+                    temp_neve, round(min(temp_neve + rng.uniform(-1, 1), 0), 1),
+                    umidita, round(min(umidita + rng.uniform(-0.1, 0.1), 1), 2),
+                    rng.choice(METEO), rng.choice(NEVE)]
+        sci = rng.randint(2, 6)
+        for numero in range(sci):
+            prima_riga = sessione if numero == 0 else [None] * len(sessione)
+            sheet.append(prima_riga + [
+                f"{numero + 1}A", rng.choice(IMPRONTE), rng.choice(STRUTTURE), rng.choice(PARAFFINE),
+                rng.choice(STESURE), None, None,
+                frase(rng) if rng.random() < 0.5 else None,
+                f"{rng.choice(CONSIDERAZIONI)}, {frase(rng)}",
+                frase(rng) if rng.random() < 0.3 else None,
+            ])
+        # Riga vuota di separazione tra i gruppi
+        sheet.append([])
+        scritte += sci + 1
+    workbook.save(path)
+
+def misura(funzione, ripetizioni=5):
+    """Mediana dei tempi di esecuzione in secondi"""
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - inizio)
+    return statistics.median(tempi)
+
+def misura_filtro(dataset, query, ripetizioni=5):
+    """Tempo di una query senza il contributo della cache dei risultati"""
+    def esegui():
+        dataset.result_cache = OrderedDict()
+        dataset.query(query)
+    return misura(esegui, ripetizioni)
+
+FILTRI = {
+    "testo_luogo": StruttureQuery(luogo="cogne"),
+    "testo_corto": StruttureQuery(luogo="co"),
+    "testo_meteo": StruttureQuery(meteo="sereno"),
+    "testo_considerazioni": StruttureQuery(considerazioni="scorrevolezza"),
+    "numerico_valore": StruttureQuery(temp_aria="-2"),
+    "numerico_intervallo": StruttureQuery(temp_neve="-8..-3"),
+    "umidita": StruttureQuery(umidita="0.6"),
+    "scelta": StruttureQuery(scelta="prima"),
+    "combinato": StruttureQuery(luogo="cogne", temp_neve="-8..-3", scelta="prima"),
+    "simili": StruttureQuery(temp_aria="-3", temp_neve="-6", umidita="70", tipo_neve="farin", simili=True),
+}
+
+def benchmark_tabella(dataset):
+    """Popolamento della tabella e primo disegno, con Qt offscreen"""
+    from PyQt6.QtWidgets import QApplication, QTableView
+    from PyQt6.QtCore import QSortFilterProxyModel
+    from strutture4 import ExcelViewer, StruttureTableModel
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    model = StruttureTableModel(ExcelViewer.SCELTA_COLORS)
+    proxy = QSortFilterProxyModel()
+    proxy.setSourceModel(model)
+    view = QTableView()
+    view.setModel(proxy)
+    view.horizontalHeader().setResizeContentsPrecision(ExcelViewer.COLUMN_SIZE_SAMPLE)
+    view.resize(1400, 700)
+    tutte = dataset.query(StruttureQuery()).rows
+    poche = dataset.query(StruttureQuery(luogo="cogne")).rows
+
+    def popola(righe):
+        def esegui():
+            model.set_rows(dataset, righe)
+            view.resizeColumnsToContents()
+            view.grab()
+            app.processEvents()
+        return esegui
+
+    return {
+        "tabella_tutte": misura(popola(tutte), 3),
+        "tabella_filtrata": misura(popola(poche), 3),
+    }
+
+def benchmark(path, cache_dir, ripetizioni, tabella=True):
+    risultati = {}
+    dataset = StruttureDataset(path, None)
+
+    inizio = time.perf_counter()
+    df, group_ids = dataset.ingest()
+    risultati["lettura"] = time.perf_counter() - inizio
+
+    # Solo le colonne compatte e le impronte: gli indici si misurano a parte
+    compatti = []
+    risultati["compattazione"] = misura(lambda: compatti.append(dataset.compact_data(df, group_ids)), 1)
+    dataset.set_columns(*compatti[0])
+    blank = group_ids < 0
+    risultati["raggruppamento"] = misura(lambda: dataset.split_groups(group_ids_from_blank(blank)[~blank]), ripetizioni)
+    risultati["indici"] = misura(dataset.normalize_rows, 1)
+    risultati["scelte"] = misura(dataset.classify_rows, ripetizioni)
+    righe = len(df)
+    del df
+
+    # Cache su disco: scrittura e riapertura come a un avvio successivo
+    dataset.cache_dir = cache_dir
+    risultati["cache_scrittura"] = misura(lambda: dataset.write_cache(None), 1)
+    risultati["cache_lettura"] = misura(dataset.read_cache, ripetizioni)
+
+    for nome, query in FILTRI.items():
+        risultati[f"filtro_{nome}"] = misura_filtro(dataset, query, ripetizioni)
+    if tabella:
+        risultati.update(benchmark_tabella(dataset))
+    memoria = {f"{nome} ({tipo})": byte for nome, tipo, byte in dataset.memory_report()}
+    return {"righe": int(righe), "gruppi": int(dataset.group_count), "tempi": risultati,
+            "memoria": memoria, "memoria_totale": sum(memoria.values())}
+
+def versione():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def confronta(attuale, precedente):
+    """Stampa la variazione di ogni tempo rispetto a un file di risultati precedente"""
+    for dimensione, misure in attuale["risultati"].items():
+        prima = precedente.get("risultati", {}).get(dimensione)
+        if not prima:
+            continue
+        print(f"\n{dimensione} righe (rispetto a {precedente.get('versione')}):")
+        for fase, secondi in misure["tempi"].items():
+            vecchio = prima["tempi"].get(fase)
+            if vecchio:
+                print(f"  {fase:28s} {vecchio * 1000:10.2f} ms -> {secondi * 1000:10.2f} ms  ({(secondi / vecchio - 1) * 100:+.0f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark su fogli STRUTTURE sintetici.")
+    parser.add_argument("--righe", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="dimensioni dei fogli generati (fino a 1000000)")
+    parser.add_argument("--cartella", default="benchmark_dati", help="dove tenere i fogli generati e le cache")
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--senza-tabella", action="store_true", help="salta le misure con Qt")
+    parser.add_argument("--output", help="file JSON dei risultati (predefinito: benchmark_<data>.json)")
+    parser.add_argument("--confronta", help="file JSON di un'esecuzione precedente")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.cartella, exist_ok=True)
+    esito = {
+        "versione": versione(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "piattaforma": platform.platform(),
+        "numpy": np.__version__,
+        "risultati": {},
+    }
+    for righe in args.righe:
+        path = os.path.join(args.cartella, f"strutture_{righe}_{args.seed}_v{GENERATORE}.xlsx")
+        if not os.path.exists(path):
+            print(f"Generazione {path}...", flush=True)
+            genera_workbook(path, righe, args.seed)
+        print(f"Benchmark {righe} righe...", flush=True)
+        esito["risultati"][str(righe)] = benchmark(
+            path, os.path.join(args.cartella, f"cache_{righe}"), args.ripetizioni, not args.senza_tabella)
+        for fase, secondi in esito["risultati"][str(righe)]["tempi"].items():
+            print(f"  {fase:28s} {secondi * 1000:10.2f} ms")
+        print(f"  {'memoria':28s} {esito['risultati'][str(righe)]['memoria_totale'] / 1024:10.1f} KB")
+
+    output = args.output or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(esito, f, indent=2)
+    print(f"Risultati salvati in {output}")
+
+    if args.confronta:
+        with open(args.confronta) as f:
+            confronta(esito, json.load(f))
+
+if __name__ == "__main__":
+    main()
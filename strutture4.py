@@ -1,17 +1,31 @@
+import time
+# Inizio del caricamento dei moduli, per il resoconto dei tempi di avvio
+IMPORT_STARTED = time.perf_counter()
 import sys
 import os
 import json
-import pandas as pd
-import requests
-import random
-import time
+import html
+import hashlib
+import queue
+import threading
+import numpy as np
+# pandas, openpyxl e requests si importano solo nelle funzioni che li usano:
+# lo splash compare prima e un avvio senza rete non carica requests
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
-    QLabel, QTableWidget, QTableWidgetItem, QMessageBox,
-    QPushButton, QComboBox, QLineEdit, QFrame, QSplashScreen, QProgressBar
+    QLabel, QTableView, QMessageBox, QAbstractItemView,
+    QPushButton, QComboBox, QLineEdit, QFrame, QSplashScreen, QProgressBar, QCompleter
+)
+from PyQt6.QtCore import (
+    Qt, QUrl, QTimer, QPropertyAnimation, QEasingCurve, QParallelAnimationGroup,
+    QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QStringListModel,
+    QItemSelection, QItemSelectionModel, QFileSystemWatcher, QObject, QThread, pyqtSignal
 )
-from PyQt6.QtCore import Qt, QUrl, QTimer, QPropertyAnimation, QEasingCurve, QParallelAnimationGroup
 from PyQt6.QtGui import QColor, QDesktopServices, QFont, QPalette, QPixmap, QPainter, QLinearGradient, QBrush, QIcon
+from strutture_dati import TRACER, StruttureDataset, StruttureQuery, fold_text, format_explain, read_sheet_names
 
 # Configurazione
 CONFIG = {
@@ -20,7 +34,28 @@ CONFIG = {
         "https://file.garden/Z-hU1H4Shk27aYus/latest.json"
     ],
     "fallback_url": "https://file.garden/Z-hU1H4Shk27aYus/STRUTTURE.xlsx",
-    "config_file": "app_config.json"
+    "config_file": "app_config.json",
+    # Download a segmenti dai mirror che pubblicano lo stesso sha256
+    "download": {
+        "segment_size": 1024 * 1024,
+        "min_parallel_size": 2 * 1024 * 1024,
+        "connections_per_mirror": 2,
+        # Sotto questa velocità (byte/s) un mirror viene scartato
+        "min_speed": 32 * 1024
+    },
+    "cache_dir": "cache",
+    # Motore dei dati: "memoria" (foglio tenuto in RAM) oppure "sqlite" (archivio
+    # locale importato in modo incrementale, per gli storici di più stagioni)
+    "backend": "memoria",
+    "sqlite_file": "strutture.sqlite",
+    # Attesa dopo l'ultima modifica di un campo prima di rifiltrare (ms)
+    "debounce_ms": 250,
+    # Attesa dopo l'ultima modifica del file Excel prima di ricaricarlo (ms):
+    # un salvataggio scrive il file in più passaggi
+    "reload_delay_ms": 1000,
+    # Attesa massima alla chiusura per i compiti in background (ms): i download si
+    # interrompono lasciando il .tmp per la ripresa
+    "close_wait_ms": 2000
 }
 
 class CinematicLoadingScreen(QSplashScreen):
@@ -112,30 +147,6 @@ class CinematicLoadingScreen(QSplashScreen):
         self.main_layout.addWidget(self.progress_container)
         
         self.setup_animations()
-        
-        self.loading_phrases = [
-            ("Ottimizzazione algoritmi...", "Analisi strutture in corso"),
-            ("Caricamento database...", "Accesso ai record storici"),
-            ("Calibrazione parametri...", "Sintonizzazione precisione"),
-            ("Preparazione interfaccia...", "Design cinematico in caricamento"),
-            ("Verifica connessioni...", "Sincronizzazione cloud"),
-            ("Analisi prestazioni...", "Benchmarking sistema"),
-            ("Inizializzazione moduli...", "Caricamento componenti essenziali"),
-            ("Preparazione report...", "Generazione dashboard"),
-            ("Ottimizzazione memoria...", "Allocazione risorse"),
-            ("Caricamento completato!", "Pronto per l'analisi")
-        ]
-        
-        self.message_timer = QTimer()
-        self.message_timer.timeout.connect(self.update_loading_message)
-        self.message_timer.start(2500)
-        
-        self.progress_timer = QTimer()
-        self.progress_timer.timeout.connect(self.simulate_progress)
-        self.progress_timer.start(50)
-        
-        self.current_progress = 0
-        self.target_progress = 0
         self.show()
     
     def setup_animations(self):
@@ -162,37 +173,16 @@ class CinematicLoadingScreen(QSplashScreen):
         
         self.animation_group.start()
     
-    def update_loading_message(self):
-        if self.target_progress >= 100:
-            return
-            
-        phase = min(int(self.target_progress / 10), 9)
-        msg, detail = self.loading_phrases[phase]
-        self.message.setText(msg)
+    def set_progress(self, percent, message, detail):
+        """Aggiorna barra e messaggi con l'avanzamento reale del caricamento"""
+        self.progress.setValue(percent)
+        self.percent.setText(f"{percent}%")
+        self.message.setText(message)
         self.details.setText(detail)
         
-        if self.target_progress < 100:
-            increment = random.uniform(6, 10)
-            self.target_progress = min(self.target_progress + increment, 100)
-    
-    def simulate_progress(self):
-        if self.current_progress < self.target_progress:
-            step = max(0.5, min(3, (self.target_progress - self.current_progress) / 3))
-            self.current_progress += step
-            
-            if self.target_progress - self.current_progress < 5:
-                self.current_progress += 0.1
-            
-            self.progress.setValue(int(self.current_progress))
-            self.percent.setText(f"{int(self.current_progress)}%")
-            
-            if self.current_progress >= 100:
-                self.progress_timer.stop()
-                self.message_timer.stop()
-                self.message.setText("Caricamento completato!")
-                self.details.setText("Pronto per l'analisi")
-                self.title.setStyleSheet("font-size: 28px; font-weight: bold; color: #2ecc71;")
-                self.logo.setText("🎿")
+        if percent >= 100:
+            self.title.setStyleSheet("font-size: 28px; font-weight: bold; color: #2ecc71;")
+            self.logo.setText("🎿")
     
     def paintEvent(self, event):
         painter = QPainter(self)
@@ -208,14 +198,203 @@ class CinematicLoadingScreen(QSplashScreen):
         
         super().paintEvent(event)
 
+class StartupTimer:
+    """Durata delle fasi di avvio, stampata se si lancia con --startup-timing
+    o con la variabile d'ambiente STRUTTURE_STARTUP_TIMING=1"""
+
+    PHASES = ["import", "config", "network", "validation", "parse", "first-render"]
+
+    def __init__(self):
+        self.enabled = False
+        self.durations = dict.fromkeys(self.PHASES, 0.0)
+        self.reported = False
+
+    def add(self, phase, seconds):
+        self.durations[phase] += seconds
+
+    @contextmanager
+    def phase(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - started)
+
+    def report(self):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        total = sum(self.durations.values())
+        parts = " | ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.durations.items())
+        print(f"Tempi di avvio: {parts} | totale {total * 1000:.0f} ms")
+
+STARTUP = StartupTimer()
+
+class StruttureTableModel(QAbstractTableModel):
+    """Modello Qt sulle righe filtrate del dataset.
+
+    Non copia i dati: tiene solo gli indici delle righe selezionate e legge
+    testo e colore di una cella quando la vista la disegna.
+    """
+
+    def __init__(self, scelta_colors, parent=None):
+        super().__init__(parent)
+        self.scelta_colors = scelta_colors
+        self.columns = []
+        self.column_values = []
+        self.row_indices = np.empty(0, dtype=np.intp)
+        self.scelta_codes = np.empty(0, dtype=np.int8)
+        self.code_colors = []
+
+    def set_rows(self, dataset, row_indices):
+        """Mostra le righe indicate; restituisce True se sono cambiate le colonne"""
+        columns = list(dataset.columns)
+        columns_changed = columns != self.columns
+        self.beginResetModel()
+        self.columns = columns
+        self.column_values = list(dataset.columns.values())
+        self.row_indices = row_indices
+        self.scelta_codes = np.asarray(dataset.scelta.codes)
+        self.code_colors = [self.scelta_colors.get(scelta) for scelta in dataset.scelta.categories]
+        self.endResetModel()
+        return columns_changed
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.row_indices)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.row_indices[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.column_values[index.column()][row]
+        if role == Qt.ItemDataRole.BackgroundRole:
+            # Evidenziazione basata sulla scelta già classificata per la riga
+            code = self.scelta_codes[row]
+            if code >= 0:
+                return self.code_colors[code]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.columns[section]
+        return str(section + 1)
+
+class TermCompleter(QCompleter):
+    """Completamento dell'ultimo termine di un filtro: in "dobbiaco|liv" resta "dobbiaco|" davanti"""
+
+    def __init__(self, model, parent=None):
+        super().__init__(model, parent)
+        self.prefix = ""
+
+    def pathFromIndex(self, index):
+        return self.prefix + super().pathFromIndex(index)
+
+class DownloadCancelled(Exception):
+    """Download interrotto dalla chiusura della finestra: il .tmp resta per la ripresa"""
+
+class LoadingWorker(QObject):
+    """Esegue un compito di caricamento (URL, verifica, download, parsing) fuori dal thread della GUI.
+
+    Il compito riceve le funzioni progress(fase, fatti, totale), notify(titolo, messaggio)
+    e preview(dataset parziale); il suo valore di ritorno viene emesso con finished.
+    """
+
+    # Fase: (percentuale iniziale, percentuale finale, messaggio)
+    STAGES = {
+        "verify": (0, 5, "Verifica database..."),
+        "url": (5, 10, "Verifica aggiornamenti..."),
+        "download": (10, 60, "Download database..."),
+        "parse": (60, 100, "Caricamento database..."),
+        "ready": (100, 100, "Caricamento completato!"),
+    }
+    # Intervallo minimo tra due aggiornamenti della barra (secondi)
+    REPORT_INTERVAL = 0.05
+
+    progress = pyqtSignal(int, str, str)
+    notice = pyqtSignal(str, str)
+    preview = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
+        self.last_report = 0.0
+
+    def report(self, stage, done=0, total=0):
+        start, end, message = self.STAGES[stage]
+        now = time.monotonic()
+        if 0 < done < total and now - self.last_report < self.REPORT_INTERVAL:
+            return
+        self.last_report = now
+
+        if stage == "ready":
+            self.progress.emit(end, message, "Pronto per l'analisi")
+            return
+        if total:
+            percent = start + (end - start) * min(done, total) / total
+            if stage == "download":
+                detail = f"{done / 1024:.0f} / {total / 1024:.0f} KB"
+            else:
+                detail = f"{done} / {total} righe"
+        else:
+            percent = start
+            detail = f"{done / 1024:.0f} KB" if stage == "download" and done else ""
+        self.progress.emit(int(percent), message, detail)
+
+    def run(self):
+        try:
+            result = self.task(self.report, self.notice.emit, self.preview.emit)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(result)
+
 class ExcelViewer(QWidget):
+    SCELTA_COLORS = {
+        "prima": QColor(144, 238, 144),  # Verde chiaro
+        "seconda": QColor(255, 255, 150),  # Giallo chiaro
+        "terza": QColor(255, 182, 193),  # Rosa chiaro
+    }
+    # Righe campionate per calcolare la larghezza delle colonne
+    COLUMN_SIZE_SAMPLE = 100
+    # Sintassi dei campi filtro, mostrata passando sopra un campo
+    FILTER_SYNTAX = ("a|b: uno dei due · !a: esclude · numeri: -3 (tolleranza del campo), "
+                     "-3~1 (tolleranza propria), -5..-2, >0, <=5")
+
     def __init__(self, splash):
         super().__init__()
         self.splash = splash
         self.current_url = None
-        self.setup_paths()
-        self.setup_ui()
-        self.load_data()
+        self.last_error = None
+        self.manifest_checked = False
+        self.manifest = None
+        self.download_meta = {}
+        self.database_changed = False
+        self.session = None
+        self.background_loading = False
+        self.background_jobs = []
+        # Impostato alla chiusura: i download in corso si interrompono
+        self.closing = threading.Event()
+        # Il file Excel viene ricaricato in background quando lo modifica un altro programma
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_file_changed)
+        self.file_watcher.directoryChanged.connect(self.on_file_changed)
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(CONFIG["reload_delay_ms"])
+        self.reload_timer.timeout.connect(self.start_reload)
+        with STARTUP.phase("config"):
+            self.setup_paths()
+        with STARTUP.phase("first-render"):
+            self.setup_ui()
+        self.start_loading()
 
     def setup_paths(self):
         self.app_data_dir = os.path.join(os.getenv('APPDATA'), "Strutture_XcSkiing")
@@ -223,16 +402,279 @@ class ExcelViewer(QWidget):
         self.config_path = os.path.join(self.app_data_dir, CONFIG["config_file"])
         
         os.makedirs(self.app_data_dir, exist_ok=True)
+        self.dataset = self.new_dataset()
         self.load_config()
-        self.update_excel_url()
-        
-        if not self.verify_excel_file():
-            if not self.download_excel_file():
-                QMessageBox.critical(self, "Errore Critico", 
+
+    def new_dataset(self):
+        """Dataset vuoto del motore scelto in CONFIG["backend"]"""
+        cache_dir = os.path.join(self.app_data_dir, CONFIG["cache_dir"])
+        if CONFIG["backend"] == "sqlite":
+            from strutture_sql import StruttureStore
+            return StruttureStore(self.excel_path, cache_dir, os.path.join(self.app_data_dir, CONFIG["sqlite_file"]))
+        return StruttureDataset(self.excel_path, cache_dir)
+
+    def run_in_background(self, task, on_finished, on_failed, on_progress=None, on_preview=None):
+        """Esegue task in un QThread dedicato; i risultati tornano alla GUI tramite segnali"""
+        thread = QThread(self)
+        worker = LoadingWorker(task)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        if on_progress is not None:
+            worker.progress.connect(on_progress)
+        if on_preview is not None:
+            worker.preview.connect(on_preview)
+        worker.notice.connect(self.show_notice)
+        worker.finished.connect(on_finished)
+        worker.failed.connect(on_failed)
+        worker.finished.connect(thread.quit)
+        worker.failed.connect(thread.quit)
+        # I riferimenti restano vivi finché il thread non termina
+        job = (thread, worker)
+        self.background_jobs.append(job)
+        thread.finished.connect(lambda: self.background_jobs.remove(job))
+        thread.start()
+
+    def closeEvent(self, event):
+        # I download controllano closing e si fermano; gli altri compiti hanno un'attesa limitata
+        self.closing.set()
+        deadline = time.monotonic() + CONFIG["close_wait_ms"] / 1000
+        running = []
+        for thread, _ in list(self.background_jobs):
+            thread.quit()
+            if not thread.wait(max(0, int((deadline - time.monotonic()) * 1000))):
+                running.append(thread)
+        if running:
+            # Un QThread distrutto mentre lavora termina il processo: la finestra si nasconde
+            # e si chiude quando anche l'ultimo compito è terminato
+            self.hide()
+            for thread in running:
+                thread.finished.connect(self.close)
+            event.ignore()
+            return
+        if TRACER.enabled:
+            trace_path = os.path.join(self.app_data_dir, "trace.json")
+            try:
+                TRACER.export(trace_path)
+                print(f"Trace salvata in {trace_path}")
+            except Exception as e:
+                print(f"Errore salvataggio trace: {str(e)}")
+        super().closeEvent(event)
+
+    def start_loading(self):
+        """Avvia le fasi di caricamento in un thread separato"""
+        on_progress = self.splash.set_progress if self.splash is not None else None
+        self.background_loading = True
+        self.run_in_background(self.prepare_data, self.on_data_ready, self.on_loading_failed,
+                               on_progress, self.on_preview)
+
+    def prepare_data(self, progress, notify, preview):
+        """Fasi di avvio eseguite nel thread di caricamento: nessun widget viene toccato qui.
+
+        Se c'è già un database locale valido si apre subito quello; la rete serve
+        solo quando manca, altrimenti gli aggiornamenti si cercano a finestra aperta.
+        """
+        progress("verify")
+        with STARTUP.phase("validation"):
+            valid = self.verify_excel_file()
+        if not valid:
+            progress("url")
+            with STARTUP.phase("network"):
+                if self.update_excel_url():
+                    notify("Aggiornamento", "URL del database aggiornato!\n")
+                self.manifest_checked = True
+                downloaded = self.download_excel_file(progress)
+            if not downloaded:
+                raise RuntimeError(
                     "Impossibile ottenere il file Excel necessario.\n"
                     "Assicurati di essere connesso a internet e riprova.\n"
-                    f"Ultimo URL provato: {self.current_url}")
-                sys.exit(1)
+                    f"Ultimo URL provato: {self.current_url}\n"
+                    f"Dettagli: {self.last_error}")
+        
+        # Dopo un download il file è cambiato: il dataset e la cache vengono ricostruiti.
+        # Il riferimento è locale perché la GUI può nel frattempo mostrare un'anteprima
+        dataset = self.dataset
+        with STARTUP.phase("parse"):
+            if dataset.is_stale():
+                dataset.load(progress, preview)
+        progress("ready")
+        return dataset
+
+    def check_for_updates(self, progress, notify, preview):
+        """Cerca un database più recente a finestra aperta e lo prepara senza toccare quello in uso"""
+        if self.update_excel_url():
+            notify("Aggiornamento", "URL del database aggiornato!\n")
+        if self.manifest is None or self.local_is_current():
+            return None
+        # Con le patch del manifest si scaricano solo i gruppi cambiati
+        dataset = self.update_with_deltas(progress)
+        if dataset is not None:
+            return dataset
+        # Download condizionale: se il file remoto non è cambiato costa una sola risposta 304
+        if not self.download_excel_file(progress, conditional=True):
+            print(f"Aggiornamento non riuscito: {self.last_error}")
+            return None
+        if not self.database_changed:
+            return None
+        dataset = self.new_dataset()
+        dataset.load()
+        return dataset
+
+    def start_update_check(self):
+        self.background_loading = True
+        self.run_in_background(self.check_for_updates, self.on_update_ready, self.on_update_failed)
+
+    def on_update_ready(self, dataset):
+        self.background_loading = False
+        if dataset is not None:
+            self.dataset = dataset
+            self.load_data()
+
+    def on_update_failed(self, message):
+        self.background_loading = False
+        print(f"Errore controllo aggiornamenti: {message}")
+
+    def show_notice(self, title, message):
+        QMessageBox.information(self, title, message)
+
+    def on_preview(self, dataset):
+        """Primi gruppi già letti: la finestra si apre senza aspettare il resto del foglio"""
+        if self.isVisible():
+            return
+        self.dataset = dataset
+        with STARTUP.phase("first-render"):
+            self.load_data()
+            self.status_label.setText(self.status_label.text() + " | ⏳ Caricamento in corso...")
+        self.show_window()
+
+    def on_data_ready(self, dataset):
+        self.dataset = dataset
+        self.background_loading = False
+        self.watch_excel_file()
+        if self.isVisible():
+            self.load_data()
+        else:
+            with STARTUP.phase("first-render"):
+                self.load_data()
+            self.show_window()
+        if not self.manifest_checked:
+            self.start_update_check()
+
+    def watch_excel_file(self):
+        """Osserva il file Excel e la sua cartella: salvando, molti programmi sostituiscono il file
+        e l'osservazione del vecchio file si perde"""
+        if self.app_data_dir not in self.file_watcher.directories():
+            self.file_watcher.addPath(self.app_data_dir)
+        if os.path.exists(self.excel_path) and self.excel_path not in self.file_watcher.files():
+            self.file_watcher.addPath(self.excel_path)
+
+    def on_file_changed(self, path):
+        # Nella cartella scrive anche l'applicazione (cache, configurazione): conta solo il file Excel
+        if path == self.app_data_dir and self.excel_path in self.file_watcher.files():
+            return
+        self.reload_timer.start()
+
+    def start_reload(self):
+        """Ricarica in background il file cambiato su disco; la tabella resta utilizzabile"""
+        self.watch_excel_file()
+        if not os.path.exists(self.excel_path):
+            return
+        if self.background_loading:
+            # Riprova quando il caricamento in corso è terminato
+            self.reload_timer.start()
+            return
+        self.background_loading = True
+        self.run_in_background(partial(self.reload_changed_file, self.dataset),
+                               self.on_reload_ready, self.on_reload_failed)
+
+    def reload_changed_file(self, dataset, progress, notify, preview):
+        if not dataset.is_stale():
+            return None
+        return dataset.reloaded()
+
+    def on_reload_ready(self, dataset):
+        self.background_loading = False
+        if dataset is None or dataset is self.dataset:
+            return
+        # Le righe cambiano posizione: selezione e scorrimento si ritrovano dal contenuto
+        state = self.table_state()
+        self.dataset = dataset
+        self.load_data()
+        self.restore_table_state(state)
+        print(f"File ricaricato: {dataset.groups_changed} gruppi nuovi o modificati")
+
+    def on_reload_failed(self, message):
+        # Un file a metà salvataggio non si legge: il prossimo cambiamento riprova
+        self.background_loading = False
+        print(f"Errore ricaricamento: {message}")
+
+    def view_row_key(self, view_row):
+        source_row = self.table_proxy.mapToSource(self.table_proxy.index(view_row, 0)).row()
+        return self.dataset.row_key(self.table_model.row_indices[source_row])
+
+    def view_rows_for_keys(self, keys):
+        """Righe della tabella che mostrano le righe con le chiavi date (None se non più visibili)"""
+        rows = self.dataset.rows_for_keys(keys)
+        wanted = np.array([row for row in rows if row is not None], dtype=np.intp)
+        shown = np.flatnonzero(np.isin(self.table_model.row_indices, wanted))
+        source_rows = dict(zip(self.table_model.row_indices[shown].tolist(), shown.tolist()))
+        view_rows = []
+        for row in rows:
+            if row is None or row not in source_rows:
+                view_rows.append(None)
+            else:
+                view_rows.append(self.table_proxy.mapFromSource(self.table_model.index(source_rows[row], 0)).row())
+        return view_rows
+
+    def table_state(self):
+        """Celle selezionate, cella corrente e prima riga visibile della tabella, per ritrovarle dopo un ricaricamento"""
+        selected = [(self.view_row_key(index.row()), index.column())
+                    for index in self.table.selectionModel().selectedIndexes()]
+        current = self.table.currentIndex()
+        current = (self.view_row_key(current.row()), current.column()) if current.isValid() else None
+        top = self.table.rowAt(0)
+        top = self.view_row_key(top) if top >= 0 else None
+        return selected, current, top, self.table.horizontalScrollBar().value()
+
+    def restore_table_state(self, state):
+        selected, current, top, horizontal = state
+        keys = [key for key, _ in selected] + [current[0] if current else None, top]
+        view_rows = self.view_rows_for_keys([key for key in keys if key is not None])
+        found = iter(view_rows)
+        view_rows = [next(found) if key is not None else None for key in keys]
+
+        selection = QItemSelection()
+        for (_, column), row in zip(selected, view_rows):
+            if row is not None:
+                index = self.table_proxy.index(row, column)
+                selection.select(index, index)
+        self.table.selectionModel().select(selection, QItemSelectionModel.SelectionFlag.ClearAndSelect)
+        current_row, top_row = view_rows[-2], view_rows[-1]
+        if current_row is not None:
+            self.table.selectionModel().setCurrentIndex(
+                self.table_proxy.index(current_row, current[1]), QItemSelectionModel.SelectionFlag.NoUpdate)
+        if top_row is not None:
+            self.table.scrollTo(self.table_proxy.index(top_row, 0), QAbstractItemView.ScrollHint.PositionAtTop)
+        self.table.horizontalScrollBar().setValue(horizontal)
+
+    def show_window(self):
+        """Mostra la finestra; il tempo di avvio termina al primo disegno completo"""
+        started = time.perf_counter()
+        self.show()
+        if self.splash is not None:
+            self.splash.finish(self)
+
+        def first_paint_done():
+            STARTUP.add("first-render", time.perf_counter() - started)
+            STARTUP.report()
+        QTimer.singleShot(0, first_paint_done)
+
+    def on_loading_failed(self, message):
+        if self.splash is not None:
+            self.splash.close()
+        if self.closing.is_set():
+            return
+        QMessageBox.critical(self, "Errore Critico", message)
+        QApplication.exit(1)
 
     def load_config(self):
         try:
@@ -240,6 +682,8 @@ class ExcelViewer(QWidget):
                 with open(self.config_path, 'r') as f:
                     config = json.load(f)
                     self.current_url = config.get("last_working_url", CONFIG["fallback_url"])
+                    # Validatori HTTP, versione e hash della copia locale
+                    self.download_meta = config.get("download", {})
             else:
                 self.current_url = CONFIG["fallback_url"]
                 self.save_config()
@@ -249,35 +693,182 @@ class ExcelViewer(QWidget):
     def save_config(self):
         try:
             with open(self.config_path, 'w') as f:
-                json.dump({"last_working_url": self.current_url}, f)
+                json.dump({
+                    "last_working_url": self.current_url,
+                    "download": self.download_meta
+                }, f)
         except Exception:
             pass
 
-    def update_excel_url(self):
+    def fetch_manifest(self, update_url):
+        import requests
+        response = requests.get(update_url, timeout=5)
+        response.raise_for_status()
+        data = response.json()
+        if not data.get("excel_url"):
+            raise ValueError(f"Manifest senza excel_url: {update_url}")
+        return data
+
+    def find_manifest(self):
+        """Interroga tutti i mirror insieme; vince la prima risposta valida"""
+        pool = ThreadPoolExecutor(max_workers=len(CONFIG["update_urls"]))
         try:
-            for update_url in CONFIG["update_urls"]:
+            futures = [pool.submit(self.fetch_manifest, url) for url in CONFIG["update_urls"]]
+            for future in as_completed(futures):
                 try:
-                    response = requests.get(update_url, timeout=5)
-                    if response.status_code == 200:
-                        data = response.json()
-                        new_url = data.get("excel_url")
-                        if new_url and new_url != self.current_url:
-                            self.current_url = new_url
-                            self.save_config()
-                            QMessageBox.information(self, "Aggiornamento", 
-                                f"URL del database aggiornato!\n")
-                        break
+                    return future.result()
                 except Exception:
                     continue
+            return None
+        finally:
+            # Non aspetta i mirror più lenti
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @TRACER.traced("update_excel_url")
+    def update_excel_url(self):
+        """Controlla i manifest remoti; True se l'URL del database è cambiato.
+
+        Il manifest (excel_url, version, sha256) resta in self.manifest per i download.
+        """
+        try:
+            data = self.find_manifest()
+            self.manifest = data
+            if data:
+                new_url = data.get("excel_url")
+                if new_url and new_url != self.current_url:
+                    self.current_url = new_url
+                    self.save_config()
+                    return True
         except Exception:
             pass
+        return False
+
+    def local_is_current(self):
+        """True se il manifest indica un hash uguale a quello del file locale"""
+        expected_sha = (self.manifest or {}).get("sha256")
+        if not expected_sha or not os.path.exists(self.excel_path):
+            return False
+        return self.local_version() == expected_sha.lower()
 
+    def local_version(self):
+        """sha256 (quello pubblicato nel manifest) della versione che il file locale contiene.
+
+        Dopo un aggiornamento con le patch il file è riscritto in locale e ha un hash
+        diverso da quello pubblicato: download_meta li tiene entrambi.
+        """
+        local_sha = self.dataset.file_hash()
+        if self.download_meta.get("local_sha256") == local_sha:
+            return self.download_meta["sha256"]
+        return local_sha
+
+    def delta_chain(self):
+        """Patch del manifest che portano dalla versione locale a quella pubblicata; None se la catena è interrotta"""
+        manifest = self.manifest or {}
+        target = (manifest.get("sha256") or "").lower()
+        deltas = {delta["from"].lower(): delta for delta in manifest.get("deltas", [])
+                  if delta.get("from") and delta.get("to") and delta.get("url")}
+        if not target or not deltas or not os.path.exists(self.excel_path):
+            return None
+        version = self.local_version()
+        chain = []
+        while version != target:
+            delta = deltas.get(version)
+            if delta is None or len(chain) >= len(deltas):
+                return None
+            chain.append(delta)
+            version = delta["to"].lower()
+        return chain
+
+    def download_patch(self, delta):
+        """Patch JSON verificata con lo sha256 del manifest; un URL relativo è accanto al foglio"""
+        from urllib.parse import urljoin
+        response = self.http_session().get(urljoin(self.manifest["excel_url"], delta["url"]), timeout=30)
+        response.raise_for_status()
+        if delta.get("sha256") and hashlib.sha256(response.content).hexdigest() != delta["sha256"].lower():
+            raise ValueError("Patch scaricata non valida: checksum SHA-256 non corrispondente")
+        return response.json()
+
+    def update_with_deltas(self, progress=None):
+        """Aggiorna il database applicando le patch del manifest alla copia locale.
+
+        Si scaricano solo i gruppi aggiunti o modificati; il foglio e la sua cache
+        vengono riscritti in locale. Restituisce il nuovo dataset, oppure None se la
+        catena delle patch è interrotta o non applicabile (serve il file completo).
+        """
+        chain = self.delta_chain()
+        if not chain:
+            return None
+        from strutture_delta import apply_patch, dataset_from_groups, write_sheet
+        temp_path = self.excel_path + ".delta.tmp"
+        try:
+            # Base: il dataset in uso se è in memoria e aggiornato, altrimenti quello della cache
+            base = self.dataset
+            if type(base) is not StruttureDataset or base.is_stale():
+                base = StruttureDataset(self.excel_path, os.path.join(self.app_data_dir, CONFIG["cache_dir"]))
+                base.load()
+            header = list(base.columns)
+            groups = base.group_lists()
+            total = sum(delta.get("size", 0) for delta in chain)
+            done = 0
+            for delta in chain:
+                patch = self.download_patch(delta)
+                groups = apply_patch(groups, header, patch)
+                done += delta.get("size", 0)
+                if progress and total:
+                    progress("download", done, total)
+            # Righe vuote come nel foglio pubblicato: il numero di righe resta lo stesso
+            blank_rows = patch.get("blank_rows")
+
+            dataset = dataset_from_groups(self.excel_path, base.cache_dir, base.sheet_name, header, groups, base, blank_rows)
+            write_sheet(temp_path, base.sheet_name, header, groups, blank_rows)
+            os.replace(temp_path, self.excel_path)
+            dataset.signature = dataset.file_signature()
+            dataset.sha256 = dataset.file_hash()
+            dataset.write_cache(dataset.sha256)
+            dataset.mark_validated()
+        except Exception as e:
+            print(f"Aggiornamento con le patch non riuscito: {str(e)}")
+            # Un foglio scritto a metà (o non installato) non serve a nessuna ripresa
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+
+        self.download_meta = {
+            "url": self.current_url,
+            "sha256": self.manifest["sha256"].lower(),
+            "local_sha256": dataset.sha256,
+            "version": self.manifest.get("version"),
+        }
+        self.save_config()
+        self.database_changed = True
+        if CONFIG["backend"] == "sqlite":
+            # L'archivio importa i soli gruppi cambiati dal foglio riscritto
+            dataset = self.new_dataset()
+            dataset.load()
+        return dataset
+
+    def read_partial_meta(self, temp_path):
+        try:
+            with open(temp_path + ".json", 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def discard_partial(self, temp_path):
+        for path in (temp_path, temp_path + ".json"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @TRACER.traced("verify_excel_file")
     def verify_excel_file(self):
         if os.path.exists(self.excel_path):
+            # Un file già validato (o con una cache valida) non si ricontrolla
+            if self.dataset.is_validated() or self.dataset.has_valid_cache():
+                return True
             try:
-                with pd.ExcelFile(self.excel_path) as xls:
-                    if "Foglio1" not in xls.sheet_names:
-                        return False
+                if "Foglio1" not in read_sheet_names(self.excel_path):
+                    return False
+                self.dataset.mark_validated()
                 return True
             except Exception as e:
                 print(f"Errore verifica file Excel: {str(e)}")
@@ -285,41 +876,286 @@ class ExcelViewer(QWidget):
                 return False
         return False
 
-    def download_excel_file(self):
+    def http_session(self):
+        """Sessione HTTP condivisa, con un pool di connessioni per i download paralleli"""
+        if self.session is None:
+            import requests
+            pool_size = CONFIG["download"]["connections_per_mirror"] * 4
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+        return self.session
+
+    def mirror_urls(self):
+        """URL che servono lo stesso file del manifest (excel_url più l'elenco "mirrors")"""
+        manifest = self.manifest or {}
+        urls = [self.current_url] + list(manifest.get("mirrors", []))
+        return list(dict.fromkeys(url for url in urls if url))
+
+    def probe_mirror(self, url):
+        response = self.http_session().head(url, timeout=5, allow_redirects=True)
+        response.raise_for_status()
+        if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+            raise ValueError("Range non supportato")
+        return int(response.headers["Content-Length"])
+
+    def download_from_mirrors(self, temp_path, progress=None):
+        """Scarica il file a segmenti da tutti i mirror insieme, in un .tmp preallocato.
+
+        Restituisce None se il download parallelo non è applicabile (file piccolo,
+        nessun mirror con Range, un .tmp del download singolo da riprendere) o se
+        non è riuscito: in quel caso si usa il download singolo. I segmenti completati
+        sono registrati nel .tmp.json, così un download interrotto riprende da lì.
+        """
+        options = CONFIG["download"]
+        partial_meta = self.read_partial_meta(temp_path)
+        if (os.path.exists(temp_path) and partial_meta.get("url") == self.current_url
+                and (partial_meta.get("etag") or partial_meta.get("last_modified"))):
+            # Il download singolo interrotto riprende con una richiesta Range
+            return None
+        mirrors = self.mirror_urls()
+        sizes = {}
+        with ThreadPoolExecutor(max_workers=len(mirrors)) as pool:
+            probes = [(url, pool.submit(self.probe_mirror, url)) for url in mirrors]
+            for url, future in probes:
+                try:
+                    sizes[url] = future.result()
+                except Exception:
+                    continue
+        if not sizes:
+            return None
+        # Restano solo i mirror che concordano sulla dimensione dell'URL principale
+        size = sizes.get(self.current_url, next(iter(sizes.values())))
+        mirrors = [url for url, mirror_size in sizes.items() if mirror_size == size]
+        if size < options["min_parallel_size"]:
+            return None
+
+        # Ripresa: stesso file (URL, hash e dimensione) e stessa divisione in segmenti
+        state = {"url": self.current_url, "sha256": self.manifest["sha256"].lower(),
+                 "size": size, "segment_size": options["segment_size"]}
+        completed = []
+        if (os.path.exists(temp_path) and os.path.getsize(temp_path) == size
+                and all(partial_meta.get(key) == value for key, value in state.items())):
+            completed = list(partial_meta.get("segmenti", []))
+        else:
+            self.discard_partial(temp_path)
+            with open(temp_path, 'wb') as f:
+                f.truncate(size)
+
+        segments = queue.Queue()
+        for start in range(0, size, options["segment_size"]):
+            if start not in completed:
+                segments.put((start, min(start + options["segment_size"], size) - 1))
+        alive = set(mirrors)
+        lock = threading.Lock()
+        # Segmenti non ancora scritti: chi resta attende finché non arrivano a zero,
+        # perché un mirror scartato rimette in coda il suo segmento
+        remaining = [segments.qsize()]
+        done = [sum(min(options["segment_size"], size - start) for start in completed)]
+        session = self.http_session()
+
+        def save_state():
+            with open(temp_path + ".json", 'w') as f:
+                json.dump(dict(state, segmenti=sorted(completed)), f)
+
+        def fetch_segment(url, start, end):
+            length = end - start + 1
+            # Tempo massimo concesso al segmento alla velocità minima
+            deadline = time.monotonic() + max(5.0, length / options["min_speed"])
+            response = session.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=(5, 10))
+            if response.status_code != 206:
+                raise ValueError(f"Risposta {response.status_code} invece di 206")
+            buffer = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if self.closing.is_set():
+                    raise DownloadCancelled("download interrotto")
+                buffer += chunk
+                if time.monotonic() > deadline:
+                    raise TimeoutError("mirror troppo lento")
+            if len(buffer) != length:
+                raise ValueError("segmento incompleto")
+            return buffer
+
+        def worker(url):
+            with open(temp_path, 'r+b') as f:
+                while url in alive and not self.closing.is_set():
+                    try:
+                        start, end = segments.get(timeout=0.1)
+                    except queue.Empty:
+                        with lock:
+                            if not remaining[0]:
+                                return
+                        continue
+                    try:
+                        data = fetch_segment(url, start, end)
+                    except DownloadCancelled:
+                        return
+                    except Exception as e:
+                        # Il segmento torna in coda per gli altri mirror, questo viene scartato
+                        print(f"Mirror scartato {url}: {str(e)}")
+                        segments.put((start, end))
+                        alive.discard(url)
+                        return
+                    f.seek(start)
+                    f.write(data)
+                    f.flush()
+                    with lock:
+                        completed.append(start)
+                        remaining[0] -= 1
+                        save_state()
+                        done[0] += len(data)
+                        if progress:
+                            progress("download", done[0], size)
+
+        save_state()
+        workers = [url for url in mirrors for _ in range(options["connections_per_mirror"])]
+        with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+            list(pool.map(worker, workers))
+
+        if self.closing.is_set():
+            raise DownloadCancelled("download interrotto")
+        if remaining[0]:
+            # Nessun mirror rimasto: il .tmp e i segmenti completati restano per la ripresa
+            return None
+
+        digest = hashlib.sha256()
+        with open(temp_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest(), None, None
+
+    def download_single(self, temp_path, conditional=False, progress=None):
+        """Download da un solo URL in streaming; None se il server risponde 304"""
+        headers = {}
+        if (conditional and os.path.exists(self.excel_path)
+                and self.download_meta.get("url") == self.current_url):
+            if self.download_meta.get("etag"):
+                headers["If-None-Match"] = self.download_meta["etag"]
+            if self.download_meta.get("last_modified"):
+                headers["If-Modified-Since"] = self.download_meta["last_modified"]
+
+        # Ripresa: solo se il .tmp viene dallo stesso URL e il server può confermarne la versione
+        done = 0
+        partial_meta = self.read_partial_meta(temp_path)
+        validator = partial_meta.get("etag") or partial_meta.get("last_modified")
+        if os.path.exists(temp_path) and partial_meta.get("url") == self.current_url and validator:
+            done = os.path.getsize(temp_path)
+            headers["Range"] = f"bytes={done}-"
+            headers["If-Range"] = validator
+
+        if self.closing.is_set():
+            raise DownloadCancelled("download interrotto")
+        response = self.http_session().get(self.current_url, stream=True, timeout=30, headers=headers)
+        if response.status_code == 304:
+            return None
+        if response.status_code == 416 and "Range" in headers:
+            # Il .tmp è già lungo quanto il file (o più): si riparte da zero senza Range
+            response.close()
+            self.discard_partial(temp_path)
+            return self.download_single(temp_path, conditional, progress)
+        response.raise_for_status()
+
+        digest = hashlib.sha256()
+        if response.status_code == 206:
+            with open(temp_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            mode = 'ab'
+        else:
+            done = 0
+            mode = 'wb'
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with open(temp_path + ".json", 'w') as f:
+            json.dump({"url": self.current_url, "etag": etag, "last_modified": last_modified}, f)
+
+        total = done + int(response.headers.get("Content-Length") or 0)
+        with open(temp_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                if self.closing.is_set():
+                    response.close()
+                    raise DownloadCancelled("download interrotto")
+                if chunk:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress("download", done, total)
+
+        return digest.hexdigest(), etag, last_modified
+
+    @TRACER.traced("download_excel_file")
+    def download_excel_file(self, progress=None, conditional=False):
+        """Scarica il database nel file .tmp e lo installa solo se valido.
+
+        Se il manifest indica lo sha256 e i mirror supportano Range, il file arriva a
+        segmenti da tutti i mirror in parallelo. Altrimenti si scarica da un solo URL:
+        con conditional=True si inviano If-None-Match/If-Modified-Since (un file non
+        cambiato costa una risposta 304), l'hash viene calcolato durante lo streaming
+        e un download interrotto riprende dal .tmp con una richiesta Range.
+        """
         temp_path = self.excel_path + ".tmp"
+        self.database_changed = False
+        expected_sha = (self.manifest or {}).get("sha256")
+        result = None
         try:
-            response = requests.get(self.current_url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            with open(temp_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
+            # Il download a segmenti si può verificare solo con l'hash del manifest
+            if expected_sha:
+                try:
+                    result = self.download_from_mirrors(temp_path, progress)
+                except DownloadCancelled:
+                    raise
+                except Exception as e:
+                    print(f"Download parallelo non riuscito: {str(e)}")
+            if result is None:
+                result = self.download_single(temp_path, conditional, progress)
+                if result is None:
+                    return True
+            sha256, etag, last_modified = result
+
+            if expected_sha and sha256 != expected_sha.lower():
+                raise ValueError("File scaricato non valido: checksum SHA-256 non corrispondente")
+
             # Verifica che il file scaricato sia valido
             try:
-                with pd.ExcelFile(temp_path) as xls:
-                    if "Foglio1" not in xls.sheet_names:
-                        raise ValueError("Foglio mancante")
+                if "Foglio1" not in read_sheet_names(temp_path):
+                    raise ValueError("Foglio mancante")
             except Exception as e:
                 raise ValueError(f"File scaricato non valido: {str(e)}")
-            
-            if os.path.exists(self.excel_path):
-                os.remove(self.excel_path)
-            os.rename(temp_path, self.excel_path)
-            
+
+            # Sostituzione atomica: se il foglio è bloccato (aperto in Excel) resta quello vecchio
+            os.replace(temp_path, self.excel_path)
+            self.discard_partial(temp_path)
+            self.dataset.mark_validated()
+
+            self.download_meta = {
+                "url": self.current_url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "sha256": sha256,
+                "version": (self.manifest or {}).get("version"),
+            }
+            self.save_config()
+            self.database_changed = True
             return True
-            
+
         except Exception as e:
             print(f"Errore download: {str(e)}")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                
+            # Un .tmp incompleto resta per la ripresa; uno completo (non valido o non
+            # installabile, ad esempio col foglio aperto in Excel) si scarta
+            if isinstance(e, ValueError) or result is not None:
+                self.discard_partial(temp_path)
+            if isinstance(e, DownloadCancelled):
+                self.last_error = str(e)
+                return False
+
             if self.current_url != CONFIG["fallback_url"]:
                 self.current_url = CONFIG["fallback_url"]
-                return self.download_excel_file()
-                
-            QMessageBox.critical(self, "Errore", f"Download fallito: {str(e)}")
+                return self.download_excel_file(progress, conditional)
+
+            self.last_error = f"Download fallito: {str(e)}"
             return False
 
     def setup_ui(self):
@@ -352,25 +1188,28 @@ class ExcelViewer(QWidget):
         filter_layout.setHorizontalSpacing(15)
 
         self.luogo_filter = QLineEdit()
-        self.luogo_filter.setPlaceholderText("Es: Dobbiaco o Livigno")
+        self.luogo_filter.setPlaceholderText("Es: Dobbiaco|Livigno o !Anterselva")
         
         self.tipo_evento = QComboBox()
         self.tipo_evento.addItems(["Tutti", "TEST", "GARA"])
         
         self.meteo_filter = QLineEdit()
-        self.meteo_filter.setPlaceholderText("Es: soleggiato o nuvoloso")
+        self.meteo_filter.setPlaceholderText("Es: soleggiato|nuvoloso")
         
         self.temp_aria = QLineEdit()
-        self.temp_aria.setPlaceholderText("Es: -5 o 2")
+        self.temp_aria.setPlaceholderText("Es: -5, -5..-2, <0 o -3~1")
         
         self.temp_neve = QLineEdit()
-        self.temp_neve.setPlaceholderText("Es: -3 o 1")
+        self.temp_neve.setPlaceholderText("Es: -3, -4..-1 o >=-2")
         
         self.tipo_neve = QLineEdit()
-        self.tipo_neve.setPlaceholderText("Es: farinosa o umida")
+        self.tipo_neve.setPlaceholderText("Es: farinosa|umida")
         
         self.umidita = QLineEdit()
-        self.umidita.setPlaceholderText("Es: 30 o 70")
+        self.umidita.setPlaceholderText("Es: 30, 60..80 o >70")
+        
+        self.considerazioni_filter = QLineEdit()
+        self.considerazioni_filter.setPlaceholderText("Es: scorrevole o !sciolina")
         
         self.scelte_filter = QComboBox()
         self.scelte_filter.addItems(["Tutte", "Prima scelta", "Seconda scelta", "Terza scelta"])
@@ -391,20 +1230,60 @@ class ExcelViewer(QWidget):
         filter_layout.addWidget(self.umidita, 3, 1)
         filter_layout.addWidget(QLabel("🏆 Scelte:"), 3, 2)
         filter_layout.addWidget(self.scelte_filter, 3, 3)
+        filter_layout.addWidget(QLabel("💬 Considerazioni:"), 4, 0)
+        filter_layout.addWidget(self.considerazioni_filter, 4, 1, 1, 3)
 
         main_layout.addLayout(filter_layout)
 
+        # Filtri in tempo reale: si rifiltra quando l'utente smette di scrivere
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(CONFIG["debounce_ms"])
+        self.filter_timer.timeout.connect(self.load_data)
+        for field in (self.luogo_filter, self.meteo_filter, self.temp_aria,
+                      self.temp_neve, self.tipo_neve, self.umidita, self.considerazioni_filter):
+            field.textChanged.connect(self.schedule_filter)
+            field.setToolTip(self.FILTER_SYNTAX)
+
+        # Suggerimenti dalle parole del foglio, anche con errori di battitura
+        self.suggestion_models = {}
+        for field_name, field in (("luogo", self.luogo_filter), ("meteo", self.meteo_filter),
+                                  ("tipo_neve", self.tipo_neve),
+                                  ("considerazioni", self.considerazioni_filter)):
+            model = QStringListModel(self)
+            completer = TermCompleter(model, self)
+            # Il filtro lo fa l'indice: Qt non deve scartare le parole scritte diversamente
+            completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+            completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+            field.setCompleter(completer)
+            field.textEdited.connect(partial(self.update_suggestions, field_name, completer))
+            self.suggestion_models[field_name] = model
+        for combo in (self.tipo_evento, self.scelte_filter):
+            combo.currentIndexChanged.connect(self.schedule_filter)
+
         btn_layout = QHBoxLayout()
         self.filter_btn = QPushButton("🔍 Applica Filtri")
         self.filter_btn.clicked.connect(self.load_data)
         self.reset_btn = QPushButton("🔄 Reset")
         self.reset_btn.clicked.connect(self.reset_filters)
+        self.similar_btn = QPushButton("🎯 Condizioni simili")
+        self.similar_btn.setCheckable(True)
+        self.similar_btn.setToolTip("Ordina le sessioni per somiglianza a temperature, umidità, neve e meteo inseriti")
+        self.similar_btn.toggled.connect(self.load_data)
         btn_layout.addWidget(self.filter_btn)
+        btn_layout.addWidget(self.similar_btn)
         btn_layout.addWidget(self.reset_btn)
         main_layout.addLayout(btn_layout)
 
-        self.table = QTableWidget()
+        self.table_model = StruttureTableModel(self.SCELTA_COLORS, self)
+        self.table_proxy = QSortFilterProxyModel(self)
+        self.table_proxy.setSourceModel(self.table_model)
+        self.table = QTableView()
+        self.table.setModel(self.table_proxy)
+        # Nessun ordinamento iniziale: si ordina solo quando l'utente clicca un'intestazione
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
         self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setResizeContentsPrecision(self.COLUMN_SIZE_SAMPLE)
         main_layout.addWidget(self.table)
 
         self.status_label = QLabel()
@@ -421,254 +1300,103 @@ class ExcelViewer(QWidget):
         self.tipo_neve.clear()
         self.umidita.clear()
         self.meteo_filter.clear()
+        self.considerazioni_filter.clear()
         self.scelte_filter.setCurrentIndex(0)
+        self.similar_btn.setChecked(False)
         self.load_data()
 
-    def parse_temperature(self, temp_str):
-        """Funzione helper per parsare le temperature in modo più robusto"""
-        if not temp_str or str(temp_str).strip() == "":
-            return None
-        
-        temp_str = str(temp_str).strip().replace(',', '.')
-        # Rimuovi caratteri non numerici eccetto punto e segno meno
-        import re
-        temp_str = re.sub(r'[^\d\.-]', '', temp_str)
-        
-        try:
-            return float(temp_str)
-        except ValueError:
-            return None
+    def schedule_filter(self, *args):
+        self.filter_timer.start()
 
-    def parse_humidity(self, hum_str):
-        """Funzione helper per parsare l'umidità in modo più robusto"""
-        if not hum_str or str(hum_str).strip() == "":
-            return None
-        
-        hum_str = str(hum_str).strip().replace(',', '.').replace('%', '')
-        # Rimuovi caratteri non numerici eccetto punto
-        import re
-        hum_str = re.sub(r'[^\d\.]', '', hum_str)
-        
-        try:
-            return float(hum_str)
-        except ValueError:
-            return None
+    def update_suggestions(self, field_name, completer, text):
+        # Si completa solo l'ultimo termine, dopo l'ultimo "|" e un eventuale "!"
+        term = text[text.rfind("|") + 1:].lstrip().lstrip("!").lstrip()
+        completer.prefix = text[:len(text) - len(term)]
+        suggestions = self.dataset.suggest(field_name, term) if self.dataset.columns is not None else []
+        # Nessun popup se l'unica proposta è già quella scritta
+        if [fold_text(word) for word in suggestions] == [fold_text(term.strip())]:
+            suggestions = []
+        self.suggestion_models[field_name].setStringList(suggestions)
+        if suggestions:
+            completer.complete()
+        else:
+            completer.popup().hide()
 
-    def get_scelta_type(self, considerazioni_text):
-        """Determina il tipo di scelta dalle considerazioni"""
-        if not considerazioni_text:
-            return None
-        
-        considerazioni = str(considerazioni_text).upper().strip()
-        
-        # Pattern più specifici per le scelte
-        if any(pattern in considerazioni for pattern in [
-            "PRIMA SCELTA", "1° SCELTA", "1A SCELTA", "PRIMO", "MIGLIORE", 
-            "OTTIMA", "PERFETTA", "IDEALE", "BEST"
-        ]):
-            return "prima"
-        elif any(pattern in considerazioni for pattern in [
-            "SECONDA SCELTA", "2° SCELTA", "2A SCELTA", "SECONDO", 
-            "ALTERNATIVA", "BUONA"
-        ]):
-            return "seconda"
-        elif any(pattern in considerazioni for pattern in [
-            "TERZA SCELTA", "3° SCELTA", "3A SCELTA", "TERZO", 
-            "ULTIMA", "PEGGIORE", "SCONSIGLIATA"
-        ]):
-            return "terza"
-        
-        return None
+    def current_filters(self):
+        """Stato attuale dei campi filtro"""
+        return {
+            "luogo": self.luogo_filter.text(),
+            "tipo_evento": self.tipo_evento.currentText(),
+            "meteo": self.meteo_filter.text(),
+            "temp_aria": self.temp_aria.text(),
+            "temp_neve": self.temp_neve.text(),
+            "tipo_neve": self.tipo_neve.text(),
+            "umidita": self.umidita.text(),
+            "considerazioni": self.considerazioni_filter.text(),
+            "scelta": self.scelte_filter.currentText(),
+        }
+
+    def current_query(self):
+        return StruttureQuery(**self.current_filters(), simili=self.similar_btn.isChecked())
+
+    def show_plan(self, dataset):
+        """Piano dell'ultimo filtro (stime ed effettivi per fase) nel suggerimento della barra di stato"""
+        if dataset.last_plan is None:
+            self.status_label.setToolTip("")
+        elif not dataset.last_plan:
+            self.status_label.setToolTip("Risultato dalla cache dei filtri")
+        else:
+            report = format_explain(dataset.plan_report(dataset.last_plan))
+            self.status_label.setToolTip(f"<pre>{html.escape(report)}</pre>")
 
     def load_data(self):
+        self.filter_timer.stop()
         if not os.path.exists(self.excel_path):
             QMessageBox.critical(self, "Errore", "Il file Excel non esiste!")
             return
             
         try:
-            df = pd.read_excel(self.excel_path, sheet_name="Foglio1", engine='openpyxl')
-            df = df.fillna("")
-            
-            # Processa i dati in gruppi
-            groups = []
-            current_group = []
-            
-            for idx, row in df.iterrows():
-                if all(str(value).strip() == "" for value in row.values):
-                    if current_group:
-                        groups.append(pd.DataFrame(current_group))
-                        current_group = []
-                else:
-                    current_group.append(row)
-            
-            if current_group:
-                groups.append(pd.DataFrame(current_group))
-            
-            # Applica i filtri
-            filtered_groups = []
-            
-            for group in groups:
-                include_group = True
-                
-                # Filtro luogo
-                if self.luogo_filter.text().strip():
-                    luogo_text = self.luogo_filter.text().strip().lower()
-                    luogo_found = False
-                    for _, row in group.iterrows():
-                        if luogo_text in str(row.get("LUOGO", "")).lower():
-                            luogo_found = True
-                            break
-                    if not luogo_found:
-                        include_group = False
-                
-                # Filtro tipo evento
-                if include_group and self.tipo_evento.currentText() != "Tutti":
-                    tipo_text = self.tipo_evento.currentText().upper()
-                    tipo_found = False
-                    for _, row in group.iterrows():
-                        if tipo_text in str(row.get("TEST o GARA", "")).strip().upper():
-                            tipo_found = True
-                            break
-                    if not tipo_found:
-                        include_group = False
-                
-                # Filtro meteo
-                if include_group and self.meteo_filter.text().strip():
-                    meteo_text = self.meteo_filter.text().strip().lower()
-                    meteo_found = False
-                    for _, row in group.iterrows():
-                        if meteo_text in str(row.get("CONDIZIONI METEO E VENTO", "")).lower():
-                            meteo_found = True
-                            break
-                    if not meteo_found:
-                        include_group = False
-                
-                # Filtro temperatura aria (CORRETTA)
-                if include_group and self.temp_aria.text().strip():
-                    try:
-                        target_temp = float(self.temp_aria.text().strip().replace(',', '.'))
-                        temp_found = False
-                        
-                        for _, row in group.iterrows():
-                            for col in ["TEMP. ARIA INIZIO", "TEMP. ARIA FINE"]:
-                                cell_temp = self.parse_temperature(row.get(col, ""))
-                                if cell_temp is not None and abs(cell_temp - target_temp) < 0.5:
-                                    temp_found = True
-                                    break
-                            if temp_found:
-                                break
-                        
-                        if not temp_found:
-                            include_group = False
-                    except ValueError:
-                        include_group = False
-                
-                # Filtro temperatura neve (CORRETTA)
-                if include_group and self.temp_neve.text().strip():
-                    try:
-                        target_temp = float(self.temp_neve.text().strip().replace(',', '.'))
-                        temp_found = False
-                        
-                        for _, row in group.iterrows():
-                            for col in ["TEMP. NEVE INIZIO", "TEMP. NEVE FINE"]:
-                                cell_temp = self.parse_temperature(row.get(col, ""))
-                                if cell_temp is not None and abs(cell_temp - target_temp) < 0.5:
-                                    temp_found = True
-                                    break
-                            if temp_found:
-                                break
-                        
-                        if not temp_found:
-                            include_group = False
-                    except ValueError:
-                        include_group = False
-                
-                # Filtro tipo neve
-                if include_group and self.tipo_neve.text().strip():
-                    tipon_text = self.tipo_neve.text().strip().lower()
-                    tipon_found = False
-                    for _, row in group.iterrows():
-                        if tipon_text in str(row.get("TIPO NEVE", "")).lower():
-                            tipon_found = True
-                            break
-                    if not tipon_found:
-                        include_group = False
-                
-                # Filtro umidità (CORRETTA)
-                if include_group and self.umidita.text().strip():
-                    try:
-                        target_hum = float(self.umidita.text().strip().replace(',', '.'))
-                        hum_found = False
-                        
-                        for _, row in group.iterrows():
-                            for col in ["UMIDITA % INIZIO", "UMIDITA' % FINE"]:
-                                cell_hum = self.parse_humidity(row.get(col, ""))
-                                if cell_hum is not None and abs(cell_hum - target_hum) < 2:  # Tolleranza del 2%
-                                    hum_found = True
-                                    break
-                            if hum_found:
-                                break
-                        
-                        if not hum_found:
-                            include_group = False
-                    except ValueError:
-                        include_group = False
-                
-                # Filtro scelte (CORRETTO)
-                if include_group and self.scelte_filter.currentText() != "Tutte":
-                    scelta_richiesta = self.scelte_filter.currentText().lower().replace(" scelta", "")
-                    scelta_found = False
-                    
-                    for _, row in group.iterrows():
-                        considerazioni = row.get("CONSIDERAZIONE POST GARA o TEST", "")
-                        scelta_tipo = self.get_scelta_type(considerazioni)
-                        if scelta_tipo == scelta_richiesta:
-                            scelta_found = True
-                            break
-                    
-                    if not scelta_found:
-                        include_group = False
-                
-                if include_group:
-                    filtered_groups.append(group)
-            
-            # Combina tutti i gruppi filtrati
-            if filtered_groups:
-                filtered_df = pd.concat(filtered_groups, ignore_index=True)
-            else:
-                filtered_df = pd.DataFrame(columns=df.columns)
-            
-            # Popola la tabella
-            self.table.setRowCount(len(filtered_df))
-            self.table.setColumnCount(len(filtered_df.columns))
-            self.table.setHorizontalHeaderLabels(filtered_df.columns)
-            
-            for row in range(len(filtered_df)):
-                for col in range(len(filtered_df.columns)):
-                    val = filtered_df.iloc[row, col]
-                    item = QTableWidgetItem(str(val))
-                    
-                    # Evidenziazione corretta basata sulle scelte
-                    if col < len(filtered_df.columns):
-                        considerazioni = filtered_df.iloc[row].get("CONSIDERAZIONE POST GARA o TEST", "")
-                        scelta_tipo = self.get_scelta_type(considerazioni)
-                        
-                        if scelta_tipo == "prima":
-                            item.setBackground(QColor(144, 238, 144))  # Verde chiaro
-                        elif scelta_tipo == "seconda":
-                            item.setBackground(QColor(255, 255, 150))  # Giallo chiaro
-                        elif scelta_tipo == "terza":
-                            item.setBackground(QColor(255, 182, 193))  # Rosa chiaro
-                    
-                    self.table.setItem(row, col, item)
-            
-            self.table.resizeColumnsToContents()
-            
-            total_records = len(df)
-            filtered_records = len(filtered_df)
+            with TRACER.span("load_data") as refresh:
+                # Il file viene riletto solo se è cambiato dall'ultimo caricamento; durante un
+                # caricamento in background il nuovo dataset arriva già pronto dal thread, e
+                # con il file osservato i ricaricamenti li avvia start_reload, fuori dalla GUI
+                with TRACER.span("caricamento"):
+                    if not self.background_loading and self.app_data_dir not in self.file_watcher.directories():
+                        self.dataset.ensure_loaded()
+                dataset = self.dataset
+
+                # Applica i filtri (o l'ordinamento per condizioni simili)
+                scanned = dataset.rows_scanned
+                with TRACER.span("filtri") as span:
+                    result = dataset.query(self.current_query())
+                    span["righe_esaminate"] = refresh["righe_esaminate"] = dataset.rows_scanned - scanned
+                    span["gruppi"] = refresh["gruppi"] = len(result.groups)
+                self.show_plan(dataset)
+                row_indices = result.rows
+                similar = ""
+                if result.distances is not None:
+                    # La tabella mostra l'ordine di somiglianza, non un ordinamento per colonna
+                    self.table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+                    if len(result.groups):
+                        similar = (f"🎯 {len(result.groups)} sessioni più simili "
+                                   f"(distanza {result.distances[0]:.2f}–{result.distances[-1]:.2f}) | ")
+
+                # Popola la tabella: il modello legge solo le celle visibili
+                with TRACER.span("tabella"):
+                    if self.table_model.set_rows(dataset, row_indices):
+                        # Larghezze calcolate su un campione, solo quando cambiano le colonne
+                        self.table.resizeColumnsToContents()
+
+            # Dove è andato il tempo dell'ultimo aggiornamento
+            timings = " · ".join(f"{stage} {TRACER.last[stage] * 1000:.1f} ms"
+                                 for stage in ("caricamento", "filtri", "tabella"))
+            total_records = dataset.total_rows
+            filtered_records = len(row_indices)
             self.status_label.setText(
+                f"{similar}"
                 f"🔹 Record trovati: {filtered_records} | "
                 f"🔸 Record totali: {total_records} | "
+                f"⏱️ {timings} · {refresh['righe_esaminate']} righe esaminate, {refresh['gruppi']} gruppi | "
                 f"📌 Developed By: @mattygoi"
             )
             
@@ -680,24 +1408,14 @@ class ExcelViewer(QWidget):
 
 # ... (il resto del codice rimane invariato)
 if __name__ == "__main__":
+    STARTUP.add("import", time.perf_counter() - IMPORT_STARTED)
+    STARTUP.enabled = "--startup-timing" in sys.argv or os.getenv("STRUTTURE_STARTUP_TIMING") == "1"
+    # Con --trace gli intervalli misurati si salvano in trace.json (formato Chrome) alla chiusura
+    TRACER.enabled = "--trace" in sys.argv or os.getenv("STRUTTURE_TRACE") == "1"
     app = QApplication(sys.argv)
     
-    try:
-        requests.get("https://www.google.com", timeout=5)
-    except Exception:
-        QMessageBox.warning(None, "Avviso", 
-            "⚠️ Connessione internet non rilevata\n"
-            "L'applicazione funzionerà in modalità offline se hai già il file.")
-    
     splash = CinematicLoadingScreen()
-    app.processEvents()
-    
-    while splash.current_progress < 100:
-        time.sleep(0.1)
-        app.processEvents()
-    
+    # La finestra si mostra da sola quando il thread di caricamento ha finito
     window = ExcelViewer(splash)
-    window.show()
-    splash.finish(window)
     
     sys.exit(app.exec())
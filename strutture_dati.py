@@ -0,0 +1,1790 @@
+"""Dati delle strutture: lettura del foglio, gruppi, indici e filtri, senza Qt.
+
+Usato dall'interfaccia (strutture4.py), dall'archivio SQLite (strutture_sql.py)
+e da riga di comando:
+
+    python strutture_dati.py STRUTTURE.xlsx query.json > risultati.jsonl
+"""
+import os
+import re
+import sys
+import csv
+import json
+import argparse
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, fields, asdict
+from functools import partial, wraps
+from typing import Callable, Optional
+
+CONFIG = {
+    # Tolleranze dei filtri numerici quando si indica un valore singolo
+    "tolleranze": {"temp_aria": 0.5, "temp_neve": 0.5, "umidita": 2},
+    # Righe lette dal foglio per ogni blocco durante il caricamento in streaming
+    "ingest_batch_rows": 5000,
+    # Lettore del foglio: "auto" usa python-calamine se installato, altrimenti openpyxl
+    "ingest_engine": "auto",
+    # Parole proposte sotto i campi di testo (con tolleranza agli errori di battitura)
+    "max_suggerimenti": 8,
+    # Ricerca per condizioni simili
+    "similarita": {
+        "risultati": 10,
+        # Differenza che vale un punto di distanza per ciascuna condizione
+        "scale": {"temp_aria": 2.0, "temp_neve": 1.0, "umidita": 0.1},
+        # Distanza aggiunta se tipo neve o meteo non corrispondono o se un valore manca nel gruppo
+        "penalita_testo": 1.0,
+        "penalita_mancante": 1.0
+    },
+    # Numero di risultati di filtro tenuti in memoria
+    "filter_cache_size": 32,
+    # Costo relativo di un termine di ogni tipo, per l'ordine delle fasi del piano dei filtri
+    "costi_filtri": {"numerico": 1.0, "scelta": 1.0, "testo": 2.0, "testo_breve": 4.0},
+    # Pattern delle scelte nelle considerazioni, in ordine di priorità
+    "scelta_patterns": {
+        "prima": [
+            "PRIMA SCELTA", "1° SCELTA", "1A SCELTA", "PRIMO", "MIGLIORE",
+            "OTTIMA", "PERFETTA", "IDEALE", "BEST"
+        ],
+        "seconda": [
+            "SECONDA SCELTA", "2° SCELTA", "2A SCELTA", "SECONDO",
+            "ALTERNATIVA", "BUONA"
+        ],
+        "terza": [
+            "TERZA SCELTA", "3° SCELTA", "3A SCELTA", "TERZO",
+            "ULTIMA", "PEGGIORE", "SCONSIGLIATA"
+        ]
+    }
+}
+
+# Colonne usate dai filtri
+COL_LUOGO = "LUOGO"
+COL_TIPO = "TEST o GARA"
+COL_METEO = "CONDIZIONI METEO E VENTO"
+COL_TIPO_NEVE = "TIPO NEVE"
+COL_CONSIDERAZIONI = "CONSIDERAZIONE POST GARA o TEST"
+TEMP_ARIA_COLUMNS = ["TEMP. ARIA INIZIO", "TEMP. ARIA FINE"]
+TEMP_NEVE_COLUMNS = ["TEMP. NEVE INIZIO", "TEMP. NEVE FINE"]
+UMIDITA_COLUMNS = ["UMIDITA % INIZIO", "UMIDITA' % FINE"]
+TEXT_FILTER_COLUMNS = [COL_LUOGO, COL_TIPO, COL_METEO, COL_TIPO_NEVE, COL_CONSIDERAZIONI]
+# Filtri di testo: campo del filtro e colonna in cui cercare
+TEXT_FILTERS = {
+    "luogo": COL_LUOGO,
+    "tipo_evento": COL_TIPO,
+    "meteo": COL_METEO,
+    "tipo_neve": COL_TIPO_NEVE,
+    "considerazioni": COL_CONSIDERAZIONI,
+}
+# Filtri numerici: colonne interrogate e se ammettono valori negativi
+NUMERIC_FILTERS = {
+    "temp_aria": (TEMP_ARIA_COLUMNS, True),
+    "temp_neve": (TEMP_NEVE_COLUMNS, True),
+    "umidita": (UMIDITA_COLUMNS, False),
+}
+# Campi dei filtri (l'ordine di esecuzione lo decide il piano)
+FILTER_FIELDS = ["luogo", "tipo_evento", "meteo", "temp_aria", "temp_neve", "tipo_neve", "umidita",
+                 "considerazioni", "scelta"]
+# Campi che nella ricerca per condizioni simili ordinano i gruppi invece di filtrarli
+SIMILARITY_FIELDS = ["temp_aria", "temp_neve", "umidita", "tipo_neve", "meteo"]
+# Celle che una colonna numerica può contenere
+NUMBER_PATTERN = re.compile(r"^-?\d+(?:[.,]\d+)?$")
+# Segni diacritici separati dalla decomposizione NFKD
+COMBINING_MARKS = "[\u0300-\u036f]"
+
+class Tracer:
+    """Intervalli di tempo con nome, per capire dove va il tempo di un aggiornamento.
+
+    L'ultima durata di ogni intervallo è sempre disponibile in last; se enabled è
+    True gli intervalli si conservano anche per export(), nel formato trace di
+    Chrome (chrome://tracing o Perfetto).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.last = {}
+        self.thread_names = {}
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **args):
+        """Misura il blocco; il dizionario restituito accoglie dettagli da aggiungere all'evento"""
+        started = time.perf_counter()
+        try:
+            yield args
+        finally:
+            duration = time.perf_counter() - started
+            self.last[name] = duration
+            if self.enabled:
+                thread = threading.current_thread()
+                with self.lock:
+                    self.thread_names[thread.ident] = thread.name
+                    self.events.append({
+                        "name": name, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                        "ts": round((started - self.origin) * 1e6, 1),
+                        "dur": round(duration * 1e6, 1),
+                        "args": args,
+                    })
+
+    def traced(self, name):
+        """Decoratore: ogni chiamata della funzione diventa un intervallo"""
+        def decorate(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def export(self, path):
+        with self.lock:
+            names = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                     for tid, name in self.thread_names.items()]
+            events = names + list(self.events)
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+TRACER = Tracer()
+
+@dataclass
+class StruttureQuery:
+    """Ricerca sui gruppi: i campi vuoti non filtrano.
+
+    Ogni campo accetta più termini separati da "|" (basta che uno corrisponda) e
+    termini esclusi con "!": "dobbiaco|livigno|!sprint". I campi numerici
+    accettano "-3" (tolleranza del campo), "-3~1" (tolleranza propria),
+    "-5..-2", ">0", ">=0", "<5" e "<=5".
+
+    Con simili=True temperature, umidità, tipo neve e meteo ordinano i gruppi per
+    somiglianza (i primi k) invece di filtrarli; gli altri campi restano filtri.
+    """
+    luogo: str = ""
+    tipo_evento: str = ""
+    meteo: str = ""
+    temp_aria: str = ""
+    temp_neve: str = ""
+    tipo_neve: str = ""
+    umidita: str = ""
+    considerazioni: str = ""
+    scelta: str = ""
+    simili: bool = False
+    k: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Query da un oggetto JSON o da una riga CSV; un campo sconosciuto è un errore"""
+        known = {field.name for field in fields(cls)}
+        unknown = sorted(set(data) - known)
+        if unknown:
+            raise ValueError(f"Campi sconosciuti nella query: {', '.join(unknown)}")
+        values = {}
+        for name, value in data.items():
+            if value is None or str(value).strip() == "":
+                continue
+            if name == "simili":
+                values[name] = value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "si", "sì")
+            elif name == "k":
+                values[name] = int(value)
+                if values[name] < 1:
+                    raise ValueError(f"k deve essere almeno 1: {value}")
+            else:
+                values[name] = str(value)
+        return cls(**values)
+
+    def filters(self):
+        return {field: getattr(self, field) for field in FILTER_FIELDS}
+
+    def active_filters(self):
+        """Filtri che selezionano i gruppi: con simili le condizioni ordinano invece di filtrare"""
+        filters = self.filters()
+        if self.simili:
+            for field in SIMILARITY_FIELDS:
+                filters[field] = ""
+        return filters
+
+    def conditions(self):
+        """Condizioni per la ricerca dei più simili"""
+        return {
+            "temp_aria": parse_condition(self.temp_aria),
+            "temp_neve": parse_condition(self.temp_neve),
+            "umidita": parse_condition(self.umidita),
+            "tipo_neve": self.tipo_neve,
+            "meteo": self.meteo,
+        }
+
+@dataclass
+class QueryResult:
+    """Gruppi trovati (in ordine di somiglianza se la query è per simili) e le loro righe"""
+    groups: np.ndarray
+    rows: np.ndarray
+    distances: Optional[np.ndarray] = None
+
+@dataclass
+class PlanStage:
+    """Fase del piano dei filtri: un campo, con la stima dei gruppi che lo soddisfano.
+
+    groups, rows, rows_scanned e seconds si riempiono quando la fase viene eseguita.
+    """
+    name: str
+    value: str
+    evaluate: Optional[Callable]
+    estimate: float
+    cost: float
+    groups: Optional[int] = None
+    rows: Optional[int] = None
+    rows_scanned: int = 0
+    seconds: float = 0.0
+
+def parse_numeric_column(values, allow_negative=True):
+    """Converte una colonna di testo in float64 (NaN dove manca il valore), una sola volta"""
+    import pandas as pd
+    cleaned = values.str.strip().str.replace(',', '.', regex=False)
+    # Rimuovi caratteri non numerici eccetto punto (e segno meno per le temperature)
+    pattern = r'[^\d\.-]' if allow_negative else r'[^\d\.]'
+    cleaned = cleaned.str.replace(pattern, '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+def split_terms(value):
+    """Termini di un filtro: "a|b|!c" -> [(False, "a"), (False, "b"), (True, "c")]; quelli vuoti si scartano"""
+    terms = []
+    for part in value.split("|"):
+        part = part.strip()
+        negated = part.startswith("!")
+        body = part[1:].strip() if negated else part
+        if body:
+            terms.append((negated, body))
+    return terms
+
+def join_terms(terms):
+    return "|".join(("!" if negated else "") + body for negated, body in terms)
+
+@dataclass
+class NumericRange:
+    """Valori accettati da un termine numerico.
+
+    Un intervallo (low, high, estremi inclusi o no) oppure un valore con tolleranza:
+    in quel caso vale |valore - target| < tolerance (<= se inclusive), calcolato in
+    float64 come nel confronto originale, e low/high sono solo i limiti per gli indici.
+    """
+    low: float
+    high: float
+    inclusive: bool
+    target: Optional[float] = None
+    tolerance: float = 0.0
+
+    @classmethod
+    def near(cls, target, tolerance, inclusive):
+        # Limiti allargati di un ulp: l'arrotondamento di target ± tolerance non esclude nessun valore
+        return cls(np.nextafter(target - tolerance, -np.inf), np.nextafter(target + tolerance, np.inf),
+                   inclusive, target, tolerance)
+
+    def contains(self, values):
+        """Maschera dei valori (float64) accettati"""
+        if self.target is not None:
+            distance = np.abs(values - self.target)
+            return distance <= self.tolerance if self.inclusive else distance < self.tolerance
+        if self.inclusive:
+            return (values >= self.low) & (values <= self.high)
+        return (values > self.low) & (values < self.high)
+
+def parse_numeric_query(text, tolerance):
+    """Traduce un termine numerico in un NumericRange.
+
+    "-3" usa la tolleranza indicata (estremi esclusi), "-3~1" (o "-3±1") la propria
+    (estremi inclusi); "-5..-2" è un intervallo chiuso, ">0", ">=0", "<5" e "<=5"
+    sono aperti da un lato.
+    """
+    text = text.strip().replace(',', '.').replace('±', '~')
+    for operator in (">=", "<=", ">", "<"):
+        if text.startswith(operator):
+            bound = float(text[len(operator):])
+            inclusive = len(operator) == 2
+            if operator[0] == ">":
+                return NumericRange(bound, np.inf, inclusive)
+            return NumericRange(-np.inf, bound, inclusive)
+    if ".." in text:
+        low, high = (float(part) for part in text.split("..", 1))
+        return NumericRange(min(low, high), max(low, high), True)
+    if "~" in text:
+        target, spread = (float(part) for part in text.split("~", 1))
+        return NumericRange.near(target, abs(spread), True)
+    return NumericRange.near(float(text), tolerance, False)
+
+def parse_condition(text):
+    """Valore di una condizione scritta nel campo filtro: il centro del primo termine cercato.
+
+    None se il campo è vuoto, non numerico o l'intervallo è aperto.
+    """
+    for negated, body in split_terms(text):
+        if negated:
+            continue
+        try:
+            interval = parse_numeric_query(body, 0)
+        except ValueError:
+            return None
+        if interval.target is not None:
+            return interval.target
+        center = (interval.low + interval.high) / 2
+        return center if np.isfinite(center) else None
+    return None
+
+def humidity_fraction(values):
+    """Umidità come frazione: i valori sopra 1 sono percentuali"""
+    return np.where(values > 1, values / 100, values)
+
+def normalize_filters(filters):
+    """Chiave normalizzata dei filtri: coppie (campo, valore), con "" per i filtri non attivi"""
+    key = []
+    for field in FILTER_FIELDS:
+        value = str(filters.get(field, "")).strip()
+        if field in NUMERIC_FILTERS:
+            value = value.replace(',', '.')
+        elif field in TEXT_FILTERS:
+            value = fold_text(value)
+        else:
+            value = value.lower()
+        if field == "scelta":
+            value = value.replace(" scelta", "")
+        value = join_terms(split_terms(value))
+        # "Tutti"/"Tutte" sono le voci senza filtro delle due caselle a scelta
+        if field in ("tipo_evento", "scelta") and value in ("tutti", "tutte"):
+            value = ""
+        key.append((field, value))
+    return tuple(key)
+
+def text_narrows(value, previous):
+    """True se il filtro di testo value trova solo gruppi trovati anche da previous.
+
+    Ogni termine cercato deve contenere uno di quelli cercati prima (una sottostringa
+    più lunga trova meno gruppi) e ogni termine escluso prima deve contenerne uno
+    escluso ora.
+    """
+    terms = split_terms(value)
+    previous_terms = split_terms(previous)
+    wanted = [body for negated, body in terms if not negated]
+    previous_wanted = [body for negated, body in previous_terms if not negated]
+    if previous_wanted and not (wanted and all(any(old in new for old in previous_wanted) for new in wanted)):
+        return False
+    excluded = [body for negated, body in terms if negated]
+    return all(any(new in old for new in excluded) for negated, old in previous_terms if negated)
+
+def narrows(key, previous):
+    """True se i filtri key selezionano per forza un sottoinsieme dei gruppi di previous"""
+    for (field, value), (_, previous_value) in zip(key, previous):
+        if value == previous_value or previous_value == "":
+            continue
+        if field in TEXT_FILTERS and text_narrows(value, previous_value):
+            continue
+        return False
+    return True
+
+def fold_text(text):
+    """Minuscolo e senza accenti: "Città" e "citta" si confrontano uguali"""
+    return re.sub(COMBINING_MARKS, "", unicodedata.normalize("NFKD", text.lower()))
+
+def fold_column(values):
+    """fold_text applicato a una colonna di testo"""
+    return values.str.lower().str.normalize("NFKD").str.replace(COMBINING_MARKS, "", regex=True)
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def sorted_unique(values):
+    """Valori distinti in ordine: ordinamento e confronto tra vicini, più rapido di np.unique sugli interi"""
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]] if len(values) else values
+
+class TrigramIndex:
+    """Indice invertito su una colonna di testo: trigramma -> gruppi che lo contengono.
+
+    Ogni trigramma ha la lista ordinata (int32) dei suoi gruppi; solo per quelli
+    presenti in molti gruppi, dove occupa meno spazio, una bitmap. Una ricerca per
+    sottostringa interseca le liste dei suoi trigrammi, dal più raro; i gruppi
+    rimasti vanno poi confermati sulle righe, perché i trigrammi possono comparire
+    in punti diversi del testo. Gli array si salvano con la cache su disco.
+    """
+
+    def __init__(self, grams, counts, offsets, groups, dense_rows, dense, group_count):
+        """grams ordinati; per ognuno il numero di gruppi (counts) e i gruppi in
+        groups[offsets[i]:offsets[i + 1]], oppure la riga dense_rows[i] delle bitmap dense"""
+        self.grams = grams
+        self.counts = counts
+        self.offsets = offsets
+        self.groups = groups
+        self.dense_rows = dense_rows
+        self.dense = dense
+        self.group_count = group_count
+        self.positions = {gram: position for position, gram in enumerate(grams.tolist())}
+        # Per i testi più corti di un trigramma: il trigramma più diffuso che li contiene
+        self.short_groups = {}
+        for gram, count in zip(self.positions, counts.tolist()):
+            for part in {gram[:1], gram[1:2], gram[2:], gram[:2], gram[1:]}:
+                if count > self.short_groups.get(part, 0):
+                    self.short_groups[part] = count
+
+    @classmethod
+    def from_column(cls, folded, codes, group_ids, group_count):
+        """folded sono i valori distinti della colonna normalizzati e codes il valore di ogni riga"""
+        width = max(group_count, 1)
+        # Gruppi in cui compare ciascun valore distinto, da coppie (valore, gruppo) uniche
+        pairs = sorted_unique(codes.astype(np.int64) * width + group_ids)
+        pair_codes, pair_groups = np.divmod(pairs, width)
+        bounds = np.searchsorted(pair_codes, np.arange(len(folded) + 1))
+
+        # Coppie (trigramma, valore distinto), con i trigrammi numerati in ordine alfabetico
+        numbers = {}
+        gram_numbers = []
+        gram_codes = []
+        for code, text in enumerate(folded):
+            for gram in trigrams(text):
+                gram_numbers.append(numbers.setdefault(gram, len(numbers)))
+                gram_codes.append(code)
+        grams = np.array(list(numbers), dtype='<U3')
+        order = np.argsort(grams, kind='stable')
+        rank = np.empty(len(grams), dtype=np.int64)
+        rank[order] = np.arange(len(grams))
+        gram_numbers = rank[np.asarray(gram_numbers, dtype=np.int64)]
+        gram_codes = np.asarray(gram_codes, dtype=np.int64)
+
+        # Ogni coppia si espande nei gruppi del suo valore: (trigramma, gruppo) unici e ordinati
+        lengths = bounds[gram_codes + 1] - bounds[gram_codes]
+        positions = (np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                     + np.repeat(bounds[gram_codes], lengths))
+        postings = sorted_unique(np.repeat(gram_numbers, lengths) * width + pair_groups[positions])
+        posting_grams, posting_groups = np.divmod(postings, width)
+        counts = np.bincount(posting_grams, minlength=len(grams)).astype(np.int32)
+
+        # Bitmap solo dove costa meno della lista (più di un gruppo su 32)
+        is_dense = counts.astype(np.int64) * 32 > group_count
+        dense_ids = np.flatnonzero(is_dense)
+        dense_rows = np.full(len(grams), -1, dtype=np.int32)
+        dense_rows[dense_ids] = np.arange(len(dense_ids), dtype=np.int32)
+        in_dense = is_dense[posting_grams]
+        # Bitmap già compatte (un bit per gruppo, come np.packbits)
+        dense = np.zeros((len(dense_ids), (group_count + 7) // 8), dtype=np.uint8)
+        dense_groups = posting_groups[in_dense]
+        np.bitwise_or.at(dense, (dense_rows[posting_grams[in_dense]], dense_groups >> 3),
+                         (128 >> (dense_groups & 7)).astype(np.uint8))
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(np.where(is_dense, 0, counts), out=offsets[1:])
+        return cls(grams[order], counts, offsets, posting_groups[~in_dense].astype(np.int32),
+                   dense_rows, dense, group_count)
+
+    @classmethod
+    def from_arrays(cls, arrays, group_count):
+        return cls(arrays["grams"], arrays["counts"], arrays["offsets"], arrays["groups"],
+                   arrays["dense_rows"], arrays["dense"], group_count)
+
+    def arrays(self):
+        return {"grams": self.grams, "counts": self.counts, "offsets": self.offsets, "groups": self.groups,
+                "dense_rows": self.dense_rows, "dense": self.dense}
+
+    @property
+    def nbytes(self):
+        """Occupazione approssimativa di liste, bitmap e tabelle di ricerca"""
+        arrays = sum(array.nbytes for array in self.arrays().values())
+        return arrays + sys.getsizeof(self.positions) + sys.getsizeof(self.short_groups)
+
+    def estimate_groups(self, text):
+        """Stima per eccesso dei gruppi che contengono text: il suo trigramma più raro"""
+        grams = trigrams(text)
+        if not grams:
+            return self.short_groups.get(text, 0)
+        return min(int(self.counts[self.positions[gram]]) if gram in self.positions else 0 for gram in grams)
+
+    def groups_containing(self, text):
+        """Gruppi che contengono tutti i trigrammi di text; None se text è più corto di un trigramma"""
+        grams = trigrams(text)
+        if not grams:
+            return None
+        if any(gram not in self.positions for gram in grams):
+            return np.zeros(self.group_count, dtype=bool)
+        positions = sorted((self.positions[gram] for gram in grams), key=lambda position: self.counts[position])
+        sparse = [position for position in positions if self.dense_rows[position] < 0]
+        dense = [self.dense[self.dense_rows[position]] for position in positions if self.dense_rows[position] >= 0]
+        if not sparse:
+            bitmap = dense[0]
+            for row in dense[1:]:
+                bitmap = bitmap & row
+            return np.unpackbits(bitmap, count=self.group_count).astype(bool)
+        found = self.groups[self.offsets[sparse[0]]:self.offsets[sparse[0] + 1]]
+        for position in sparse[1:]:
+            found = np.intersect1d(found, self.groups[self.offsets[position]:self.offsets[position + 1]],
+                                   assume_unique=True)
+        for row in dense:
+            found = found[(row[found >> 3] >> (7 - (found & 7))) & 1 == 1]
+        result = np.zeros(self.group_count, dtype=bool)
+        result[found] = True
+        return result
+
+class WordVocabulary:
+    """Parole di una colonna di testo, per i suggerimenti tolleranti agli errori di battitura"""
+
+    def __init__(self, values, frequencies):
+        """values sono i testi distinti della colonna e frequencies quante righe li contengono"""
+        # Parola normalizzata -> forma più frequente nel foglio
+        counts = {}
+        for text, frequency in zip(values, frequencies):
+            for word in re.findall(r"\w{3,}", text):
+                key = fold_text(word)
+                counts.setdefault(key, {}).setdefault(word, 0)
+                counts[key][word] += int(frequency)
+        self.words = list(counts)
+        self.word_labels = [max(forms, key=forms.get) for forms in counts.values()]
+        self.word_grams = {}
+        for position, word in enumerate(self.words):
+            for gram in trigrams(word):
+                self.word_grams.setdefault(gram, []).append(position)
+
+    @property
+    def nbytes(self):
+        words = sum(sys.getsizeof(word) for word in self.words + self.word_labels)
+        word_grams = sum(sys.getsizeof(gram) + 8 * len(positions) for gram, positions in self.word_grams.items())
+        return words + word_grams
+
+    def suggest(self, text, limit):
+        """Parole del foglio simili a text: prima quelle che lo contengono, poi per trigrammi in comune"""
+        query = fold_text(text.strip())
+        if not query:
+            return []
+        grams = trigrams(query)
+        shared = {}
+        for gram in grams:
+            for position in self.word_grams.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        scores = {}
+        for position, count in shared.items():
+            # Somiglianza di Jaccard tra gli insiemi di trigrammi
+            similarity = count / (len(grams) + len(trigrams(self.words[position])) - count)
+            if similarity >= 0.3:
+                scores[position] = similarity
+        for position, word in enumerate(self.words):
+            if query in word:
+                scores[position] = 1 + len(query) / len(word)
+        ranked = sorted(scores, key=lambda position: (-scores[position], self.words[position]))
+        return [self.word_labels[position] for position in ranked[:limit]]
+
+class NumericIndex:
+    """Valori ordinati di una o più colonne numeriche, interrogati con searchsorted.
+
+    Tiene anche minimi e massimi ordinati dei gruppi, con cui il piano dei filtri
+    stima quanti gruppi cadono in un intervallo senza esaminare le righe.
+    """
+
+    def __init__(self, columns, group_ids):
+        row_count = len(columns[0]) if columns else 0
+        values = np.concatenate(columns) if columns else np.empty(0)
+        rows = np.tile(np.arange(row_count), len(columns))
+        valid = ~np.isnan(values)
+        order = np.argsort(values[valid], kind='stable')
+        self.values = values[valid][order]
+        self.rows = rows[valid][order]
+        # Con i valori ordinati la prima occorrenza di un gruppo è il suo minimo, l'ultima il massimo
+        groups = group_ids[self.rows]
+        _, first = np.unique(groups, return_index=True)
+        _, last = np.unique(groups[::-1], return_index=True)
+        self.group_minima = np.sort(self.values[first])
+        self.group_maxima = np.sort(self.values[::-1][last])
+
+    def rows_between(self, low, high, inclusive=True):
+        """Righe con almeno un valore nell'intervallo (aperto se inclusive è False)"""
+        if inclusive:
+            start = np.searchsorted(self.values, low, side='left')
+            end = np.searchsorted(self.values, high, side='right')
+        else:
+            start = np.searchsorted(self.values, low, side='right')
+            end = np.searchsorted(self.values, high, side='left')
+        return self.rows[start:end]
+
+    def rows_matching(self, interval):
+        """Righe con almeno un valore accettato dal NumericRange"""
+        if interval.target is None:
+            return self.rows_between(interval.low, interval.high, interval.inclusive)
+        # Candidati dall'intervallo allargato, poi il confronto esatto con la tolleranza
+        start = np.searchsorted(self.values, interval.low, side='left')
+        end = np.searchsorted(self.values, interval.high, side='right')
+        return self.rows[start:end][interval.contains(self.values[start:end])]
+
+    def estimate_groups(self, low, high, inclusive=True):
+        """Gruppi con valori tra minimo e massimo che toccano l'intervallo: stima per eccesso"""
+        # Gruppi che iniziano entro high, meno quelli che finiscono prima di low
+        starting = np.searchsorted(self.group_minima, high, side='right' if inclusive else 'left')
+        ended = np.searchsorted(self.group_maxima, low, side='left' if inclusive else 'right')
+        return max(int(starting - ended), 0)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.rows.nbytes + self.group_minima.nbytes + self.group_maxima.nbytes
+
+def read_sheet_names(path):
+    """Fogli di un .xlsx letti da xl/workbook.xml, senza caricare il workbook.
+
+    Controlla anche i CRC di tutti i file dell'archivio; solleva ValueError se
+    il file non è un workbook integro.
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            corrupted = archive.testzip()
+            if corrupted is not None:
+                raise ValueError(f"CRC non valido per {corrupted}")
+            root = ET.fromstring(archive.read("xl/workbook.xml"))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError, zlib.error, EOFError) as e:
+        raise ValueError(f"Workbook non valido: {str(e)}")
+    namespace = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    return [sheet.get("name") for sheet in root.iter(f"{namespace}sheet")]
+
+def cell_text(value):
+    """Testo di una cella come appare nel foglio ("" per le celle vuote)"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def make_header(values):
+    """Nomi delle colonne: "Unnamed: n" per i vuoti, ".1" per i doppioni (come pandas).
+
+    Gli spazi attorno al nome si tolgono: nel foglio c'è "TEMP. ARIA INIZIO " con
+    lo spazio finale, che altrimenti non corrisponde alla colonna cercata dai filtri.
+    """
+    header = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = cell_text(value).strip() or f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    # Le colonne vuote in coda non fanno parte della tabella
+    while header and header[-1].startswith("Unnamed: "):
+        header.pop()
+    return header
+
+def group_ids_from_blank(blank):
+    """Id del gruppo per ogni riga, -1 per le righe vuote di separazione"""
+    in_group = ~blank
+    # Un gruppo inizia su ogni riga piena preceduta da una riga vuota (o dall'inizio)
+    starts = in_group & ~np.r_[False, in_group[:-1]]
+    group_ids = np.cumsum(starts, dtype=np.int32) - 1
+    group_ids[blank] = -1
+    return group_ids
+
+def compact_batch(batch, chunks):
+    """Sposta i codici del blocco letto (liste) nei blocchi compatti int32 di ogni colonna"""
+    for codes, column_chunks in zip(batch, chunks):
+        if codes:
+            column_chunks.append(np.array(codes, dtype=np.int32))
+            codes.clear()
+
+def categorical_frame(header, values, chunks, row_count):
+    """DataFrame di colonne categoriche (le prime row_count righe) dai codici compattati a blocchi"""
+    import pandas as pd
+    data = {}
+    for name, mapping, column_chunks in zip(header, values, chunks):
+        codes = np.concatenate(column_chunks)[:row_count] if column_chunks else np.empty(0, dtype=np.int32)
+        # I codici sono stati assegnati nell'ordine di inserimento del dizionario
+        data[name] = pd.Categorical.from_codes(codes, categories=pd.Index(list(mapping), dtype=object))
+    return pd.DataFrame(data, columns=header)
+
+def hash_groups(frame, group_ids):
+    """Impronta del contenuto di ogni gruppo (20 byte): gruppi con le stesse celle hanno la stessa impronta"""
+    import pandas as pd
+    if not len(frame):
+        return np.empty(0, dtype='S20')
+    row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    chunks = np.split(row_hashes, np.flatnonzero(np.diff(group_ids)) + 1)
+    return np.array([hashlib.sha1(chunk.tobytes()).digest() for chunk in chunks], dtype='S20')
+
+def format_number(value):
+    """Numero come lo si scrive nel foglio: "" per NaN, senza ".0" se intero"""
+    if np.isnan(value):
+        return ""
+    if float(value).is_integer():
+        return str(int(value))
+    return str(np.float32(value))
+
+class TextColumn:
+    """Colonna di testo categorica: ogni valore distinto compare una sola volta in un
+    unico buffer UTF-8 e ogni riga tiene solo il codice (int32) del suo valore."""
+
+    kind = "testo"
+
+    def __init__(self, codes, offsets, buffer):
+        self.codes = codes
+        self.offsets = offsets
+        self.buffer = buffer
+
+    @classmethod
+    def from_values(cls, values):
+        import pandas as pd
+        codes, uniques = pd.factorize(values)
+        encoded = [value.encode('utf-8') for value in uniques]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(codes.astype(np.int32), offsets, buffer)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["codes"], arrays["offsets"], arrays["buffer"])
+
+    def arrays(self):
+        return {"codes": self.codes, "offsets": self.offsets, "buffer": self.buffer}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def value(self, code):
+        return self.buffer[self.offsets[code]:self.offsets[code + 1]].tobytes().decode('utf-8')
+
+    def __getitem__(self, row):
+        return self.value(self.codes[row])
+
+    def categories(self):
+        return [self.value(code) for code in range(len(self.offsets) - 1)]
+
+    def factorized(self):
+        """Codice di ogni riga e valori distinti"""
+        return self.codes, self.categories()
+
+    def numbers(self, allow_negative=True):
+        """Valori numerici (float64, NaN se assenti), convertendo una volta ogni valore distinto"""
+        import pandas as pd
+        parsed = parse_numeric_column(pd.Series(self.categories(), dtype=object), allow_negative)
+        return parsed[self.codes]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.offsets.nbytes + self.buffer.nbytes
+
+class NumberColumn:
+    """Colonna di soli numeri in float32 (NaN per le celle vuote), mostrata come nel foglio"""
+
+    kind = "numero"
+
+    def __init__(self, values):
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values):
+        """La colonna come numeri, o None se una cella non si riscrive identica da float32.
+
+        La conversione non perde nulla: ogni cella si mostra esattamente come nel foglio.
+        """
+        import pandas as pd
+        # I controlli riguardano solo i valori distinti
+        codes, uniques = pd.factorize(values)
+        numbers = np.full(len(uniques), np.nan, dtype=np.float32)
+        for code, text in enumerate(uniques):
+            if not text:
+                continue
+            if not NUMBER_PATTERN.match(text):
+                return None
+            number = np.float32(text.replace(',', '.'))
+            if format_number(number) != text:
+                return None
+            numbers[code] = number
+        if np.isnan(numbers).all():
+            return None
+        return cls(numbers[codes])
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["values"])
+
+    def arrays(self):
+        return {"values": self.values}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, row):
+        return format_number(self.values[row])
+
+    def factorized(self):
+        uniques, codes = np.unique(self.values, return_inverse=True)
+        return codes.astype(np.int32), [format_number(value) for value in uniques]
+
+    def numbers(self, allow_negative=True):
+        """Valori in float64 come scritti nelle celle: il float32 serve solo a conservarli.
+
+        I filtri confrontano in float64, per cui -0.2 deve valere -0.2 e non il float32 più vicino.
+        """
+        uniques, codes = np.unique(self.values, return_inverse=True)
+        exact = np.array([np.nan if np.isnan(value) else float(format_number(value)) for value in uniques])
+        values = exact[codes]
+        # Senza segno meno ammesso il "-" si scarta, come nella conversione del testo
+        return values if allow_negative else np.abs(values)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+COLUMN_KINDS = {column.kind: column for column in (TextColumn, NumberColumn)}
+
+def make_column(values):
+    """Colonna compatta per i valori di testo dati: numerica se possibile, altrimenti categorica"""
+    column = NumberColumn.from_values(values)
+    if column is None:
+        column = TextColumn.from_values(values)
+    return column
+
+def format_explain(report):
+    """Tabella leggibile di explain(): stime ed effettivi di ogni fase (le colonne presenti)"""
+    keys = [key for key in ("gruppi_stimati", "gruppi", "righe_stimate", "righe", "righe_esaminate", "ms")
+            if any(key in stage for stage in report)]
+    width = max([len("fase")] + [len(stage["fase"]) for stage in report])
+    lines = [f"{'fase':{width}s}" + "".join(f"{key.replace('_', ' '):>16s}" for key in keys)]
+    for stage in report:
+        cells = ["-" if stage[key] is None else str(stage[key]) for key in keys]
+        lines.append(f"{stage['fase']:{width}s}" + "".join(f"{cell:>16s}" for cell in cells))
+    return "\n".join(line.rstrip() for line in lines)
+
+def format_memory_report(report):
+    """Tabella leggibile di StruttureDataset.memory_report()"""
+    lines = [f"{name:40s} {kind:8s} {size / 1024:12.1f} KB" for name, kind, size in report]
+    total = sum(size for _, _, size in report)
+    lines.append(f"{'Totale':40s} {'':8s} {total / 1024:12.1f} KB")
+    return "\n".join(lines)
+
+class SheetReader:
+    """Lettura in streaming di un foglio, una riga alla volta.
+
+    Usa python-calamine se installato (più veloce), altrimenti openpyxl in sola
+    lettura: in nessuno dei due casi il workbook viene caricato tutto in memoria.
+    """
+
+    def __init__(self, path, sheet_name, engine="auto"):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.engine = engine
+        self.workbook = None
+        self.total_rows = 0
+        self.rows = iter(())
+
+    def __enter__(self):
+        calamine = None
+        if self.engine in ("auto", "calamine"):
+            try:
+                import python_calamine as calamine
+            except ImportError:
+                if self.engine == "calamine":
+                    raise
+        if calamine is not None:
+            self.workbook = calamine.CalamineWorkbook.from_path(self.path)
+            sheet = self.workbook.get_sheet_by_name(self.sheet_name)
+            self.total_rows = sheet.height
+            self.rows = iter(sheet.iter_rows())
+        else:
+            import openpyxl
+            self.workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True, keep_links=False)
+            sheet = self.workbook[self.sheet_name]
+            self.total_rows = sheet.max_row or 0
+            self.rows = sheet.iter_rows(values_only=True)
+        return self
+
+    def __exit__(self, *exc):
+        if hasattr(self.workbook, "close"):
+            self.workbook.close()
+        return False
+
+    def __iter__(self):
+        return self.rows
+
+def compile_scelta_matcher(patterns):
+    """Un'unica regex per tutte le scelte.
+
+    Ogni ramo è un lookahead ancorato all'inizio del testo, quindi vince la
+    prima scelta (in ordine di priorità) che compare in qualunque punto.
+    """
+    branches = []
+    for scelta, scelta_patterns in patterns.items():
+        alternatives = "|".join(re.escape(pattern) for pattern in scelta_patterns)
+        branches.append(f"(?=.*?(?:{alternatives}))(?P<{scelta}>)")
+    return re.compile("^(?:" + "|".join(branches) + ")", re.DOTALL)
+
+def classify_scelte(considerazioni, patterns):
+    """Colonna categorica prima/seconda/terza (NaN se nessuna scelta) calcolata in un solo passaggio"""
+    import pandas as pd
+    matcher = compile_scelta_matcher(patterns)
+    matches = considerazioni.str.upper().str.strip().str.extract(matcher)
+    scelte = list(patterns)
+    codes = np.select(
+        [matches[scelta].notna().to_numpy() for scelta in scelte],
+        np.arange(len(scelte)), default=-1)
+    return pd.Categorical.from_codes(codes, categories=scelte)
+
+class StruttureDataset:
+    """Foglio STRUTTURE caricato una sola volta e tenuto in memoria.
+
+    Il file viene riletto solo quando cambiano mtime, dimensione o hash.
+    Le righe vuote si scartano e ogni colonna è compatta: categorica (codici
+    int32 e valori distinti in un buffer) o float32 per le colonne numeriche.
+    Colonne e id dei gruppi vengono salvati in una cache su disco (file .npy)
+    legata all'hash del file sorgente, così all'avvio non si rilegge l'XML.
+    Ogni gruppo ha un'impronta del contenuto, che permette di riconoscere i
+    gruppi invariati quando il file viene modificato (reloaded).
+    """
+
+    CACHE_FORMAT = 7
+
+    def __init__(self, excel_path, cache_dir=None, sheet_name="Foglio1"):
+        self.excel_path = excel_path
+        self.cache_dir = cache_dir
+        self.sheet_name = sheet_name
+        self.columns = None
+        self.total_rows = 0
+        self.group_ids = None
+        self.group_starts = None
+        self.group_ends = None
+        self.group_hashes = None
+        # Gruppi nuovi o modificati rispetto al dataset da cui è stato ricaricato
+        self.groups_changed = 0
+        self.normalized = {}
+        self.text_index = {}
+        # Vocabolari per i suggerimenti, costruiti alla prima richiesta
+        self.vocabularies = {}
+        self.numeric = {}
+        self.numeric_index = {}
+        self.scelta = None
+        self.result_cache = OrderedDict()
+        self.signature = None
+        self.sha256 = None
+        self._hash_memo = None
+        # Righe esaminate dai filtri dall'apertura, per le statistiche di ogni aggiornamento
+        self.rows_scanned = 0
+        # Fasi dell'ultimo filtro eseguito ([] se il risultato era in cache, None se non disponibili)
+        self.last_plan = None
+
+    def file_signature(self):
+        stat = os.stat(self.excel_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def file_hash(self):
+        signature = self.file_signature()
+        if self._hash_memo and self._hash_memo[0] == signature:
+            return self._hash_memo[1]
+        digest = hashlib.sha256()
+        with open(self.excel_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self._hash_memo = (signature, digest.hexdigest())
+        return self._hash_memo[1]
+
+    def is_stale(self):
+        """True se il file su disco non corrisponde più ai dati in memoria"""
+        if self.columns is None:
+            return True
+        signature = self.file_signature()
+        if signature == self.signature:
+            return False
+        # mtime o dimensione cambiati: l'hash decide se il contenuto è davvero diverso
+        if self.file_hash() == self.sha256:
+            self.signature = signature
+            return False
+        return True
+
+    def ensure_loaded(self, progress=None):
+        if self.is_stale():
+            self.load(progress)
+        return self
+
+    def load(self, progress=None, on_preview=None):
+        """Carica il foglio (dalla cache se valida); progress riceve ("parse", righe, totale).
+
+        on_preview riceve un dataset con i primi gruppi completi quando il foglio
+        richiede più blocchi di lettura.
+        """
+        if progress:
+            progress("parse")
+        signature = self.file_signature()
+        sha256 = self.file_hash()
+
+        cached = None
+        if self.has_valid_cache():
+            try:
+                cached = self.read_cache()
+            except Exception as e:
+                print(f"Errore lettura cache: {str(e)}")
+
+        if cached is None:
+            with TRACER.span("lettura foglio") as span:
+                df, group_ids = self.ingest(progress, on_preview)
+                span["righe"] = len(df)
+            with TRACER.span("indici"):
+                self.set_data(df, group_ids)
+            try:
+                self.write_cache(sha256)
+            except Exception as e:
+                print(f"Errore scrittura cache: {str(e)}")
+        else:
+            columns, group_ids, total_rows, group_hashes, text_index = cached
+            with TRACER.span("indici"):
+                self.set_columns(columns, group_ids, total_rows, group_hashes, text_index=text_index)
+        self.signature = signature
+        self.sha256 = sha256
+        if progress:
+            progress("parse", self.total_rows, self.total_rows)
+
+    def set_data(self, df, group_ids, previous=None):
+        """Tiene le sole righe piene di df, con le colonne in forma compatta"""
+        self.set_columns(*self.compact_data(df, group_ids), previous)
+
+    def compact_data(self, df, group_ids):
+        """Colonne compatte delle sole righe piene, i loro id di gruppo, le righe del foglio e le impronte dei gruppi"""
+        in_group = group_ids >= 0
+        columns = {name: make_column(df[name].to_numpy(dtype=object)[in_group]) for name in df.columns}
+        group_hashes = hash_groups(df[in_group], group_ids[in_group])
+        return columns, group_ids[in_group], len(df), group_hashes
+
+    def set_columns(self, columns, group_ids, total_rows, group_hashes, previous=None, text_index=None):
+        """Dati del dataset; con previous (gli stessi dati prima di una modifica) i risultati
+        dei filtri già calcolati si ricalcolano solo sui gruppi cambiati. text_index sono
+        gli array degli indici dei trigrammi letti dalla cache, per non ricostruirli"""
+        self.columns = columns
+        self.total_rows = total_rows
+        self.group_hashes = group_hashes
+        self.split_groups(group_ids)
+        self.normalize_rows(text_index)
+        self.result_cache = OrderedDict()
+        self.groups_changed = self.group_count
+        if previous is not None and list(previous.columns) == list(columns):
+            self.carry_results(previous)
+
+    def reloaded(self, progress=None):
+        """Dataset del file cambiato su disco, costruito senza toccare questo, che resta in uso.
+
+        Restituisce questo stesso dataset se nessun gruppo è cambiato (ad esempio un
+        salvataggio senza modifiche); altrimenti un nuovo dataset che eredita i
+        risultati dei filtri, ricalcolati solo sui gruppi aggiunti o modificati.
+        """
+        signature = self.file_signature()
+        sha256 = self.file_hash()
+        dataset = StruttureDataset(self.excel_path, self.cache_dir, self.sheet_name)
+        with TRACER.span("lettura foglio") as span:
+            df, group_ids = dataset.ingest(progress)
+            span["righe"] = len(df)
+        with TRACER.span("indici") as span:
+            dataset.set_data(df, group_ids, previous=self)
+            span["gruppi_cambiati"] = dataset.groups_changed
+        if (dataset.groups_changed == 0 and dataset.group_count == self.group_count
+                and dataset.total_rows == self.total_rows):
+            dataset = self
+        dataset.signature = signature
+        dataset.sha256 = sha256
+        try:
+            dataset.write_cache(sha256)
+        except Exception as e:
+            print(f"Errore scrittura cache: {str(e)}")
+        return dataset
+
+    def match_groups(self, previous):
+        """Per ogni gruppo la posizione del gruppo con lo stesso contenuto in previous (-1 se nuovo o modificato)"""
+        available = {}
+        for position, digest in enumerate(previous.group_hashes):
+            available.setdefault(digest, []).append(position)
+        old_positions = np.full(self.group_count, -1, dtype=np.intp)
+        for position, digest in enumerate(self.group_hashes):
+            if available.get(digest):
+                old_positions[position] = available[digest].pop(0)
+        return old_positions
+
+    def carry_results(self, previous):
+        """Eredita i risultati dei filtri di previous: un gruppo invariato li soddisfa come prima,
+        per cui i filtri si valutano soltanto sui gruppi nuovi o modificati"""
+        old_positions = self.match_groups(previous)
+        kept = old_positions >= 0
+        self.groups_changed = int((~kept).sum())
+        # Copia: il dataset precedente può essere interrogato dalla GUI nel frattempo
+        for key, old_mask in list(previous.result_cache.items()):
+            group_mask = np.zeros(self.group_count, dtype=bool)
+            group_mask[kept] = old_mask[old_positions[kept]]
+            candidates = ~kept
+            for stage in self.compile_filters(key):
+                if not candidates.any():
+                    break
+                candidates &= stage.evaluate(candidates)
+            group_mask |= candidates
+            group_mask.flags.writeable = False
+            self.result_cache[key] = group_mask
+
+    def row_key(self, row):
+        """Identità di una riga che sopravvive al ricaricamento: impronta del gruppo e posizione nel gruppo"""
+        group = self.group_ids[row]
+        return bytes(self.group_hashes[group]), int(row - self.group_starts[group])
+
+    def rows_for_keys(self, keys):
+        """Righe con le chiavi di row_key date; None per quelle che non esistono più"""
+        positions = {}
+        for position, digest in enumerate(self.group_hashes):
+            positions.setdefault(bytes(digest), position)
+        rows = []
+        for digest, offset in keys:
+            group = positions.get(digest)
+            if group is None or offset >= self.group_ends[group] - self.group_starts[group]:
+                rows.append(None)
+            else:
+                rows.append(int(self.group_starts[group] + offset))
+        return rows
+
+    def ingest(self, progress=None, on_preview=None):
+        """Legge il foglio in streaming, a blocchi di righe.
+
+        Ogni cella diventa subito il codice del suo valore distinto e a fine blocco
+        i codici si compattano in int32, con un byte per riga per le righe vuote:
+        la memoria cresce con i valori distinti, non con le celle lette. Il frame
+        restituito ha colonne categoriche.
+        """
+        batch_rows = CONFIG["ingest_batch_rows"]
+        with SheetReader(self.excel_path, self.sheet_name, CONFIG["ingest_engine"]) as reader:
+            rows = iter(reader)
+            header = make_header(next(rows, ()))
+            width = len(header)
+            # Per colonna: valore -> codice, blocchi già compattati e codici del blocco in corso
+            values = [{} for _ in header]
+            chunks = [[] for _ in header]
+            batch = [[] for _ in header]
+            blank = bytearray()
+            last_filled = -1
+            preview_sent = False
+
+            for cells in rows:
+                texts = [cell_text(value) for value in cells[:width]]
+                texts.extend([""] * (width - len(texts)))
+                for codes, mapping, text in zip(batch, values, texts):
+                    codes.append(mapping.setdefault(text, len(mapping)))
+                is_blank = not any(text.strip() for text in texts)
+                blank.append(is_blank)
+                if not is_blank:
+                    last_filled = len(blank) - 1
+
+                if len(blank) % batch_rows == 0:
+                    compact_batch(batch, chunks)
+                    if progress:
+                        progress("parse", len(blank), reader.total_rows)
+                    if on_preview and not preview_sent:
+                        on_preview(self.preview(header, values, chunks, blank))
+                        preview_sent = True
+            compact_batch(batch, chunks)
+
+        # Le righe vuote in fondo al foglio non fanno parte dei dati
+        row_count = last_filled + 1
+        df = categorical_frame(header, values, chunks, row_count)
+        return df, group_ids_from_blank(np.frombuffer(blank, dtype=bool)[:row_count])
+
+    def preview(self, header, values, chunks, blank):
+        """Dataset con i soli gruppi già chiusi da una riga vuota, da mostrare mentre si legge il resto"""
+        blank = np.frombuffer(blank, dtype=bool)
+        closed = np.flatnonzero(blank)
+        row_count = int(closed[-1]) if len(closed) else 0
+        preview = StruttureDataset(self.excel_path, None, self.sheet_name)
+        df = categorical_frame(header, values, chunks, row_count)
+        preview.set_data(df, group_ids_from_blank(blank[:row_count]))
+        return preview
+
+    def split_groups(self, group_ids):
+        """Gruppi come intervalli di offset sulle righe piene, dato l'id del gruppo di ogni riga"""
+        self.group_ids = np.ascontiguousarray(group_ids, dtype=np.int32)
+        boundaries = np.flatnonzero(np.diff(self.group_ids)) + 1
+        self.group_starts = np.r_[0, boundaries] if len(self.group_ids) else np.empty(0, dtype=np.intp)
+        self.group_ends = np.r_[boundaries, len(self.group_ids)] if len(self.group_ids) else np.empty(0, dtype=np.intp)
+
+    @property
+    def group_count(self):
+        return len(self.group_starts)
+
+    def group(self, group_id):
+        return self.rows_frame(range(self.group_starts[group_id], self.group_ends[group_id]))
+
+    def group_range(self, group_id):
+        """Offset (inizio, fine) delle righe del gruppo"""
+        return self.group_starts[group_id], self.group_ends[group_id]
+
+    def group_rows(self, group_mask):
+        """Indici delle righe appartenenti ai gruppi selezionati: i risultati non copiano le righe"""
+        return np.flatnonzero(group_mask[self.group_ids])
+
+    def group_lists(self):
+        """Tutti i gruppi come liste di righe, ogni riga la lista dei testi delle sue celle"""
+        values = []
+        for column in self.columns.values():
+            codes, categories = column.factorized()
+            values.append([categories[code] for code in codes.tolist()])
+        rows = [list(row) for row in zip(*values)]
+        return [rows[start:end] for start, end in zip(self.group_starts.tolist(), self.group_ends.tolist())]
+
+    def row_records(self, rows):
+        """Righe indicate come dizionari colonna -> testo"""
+        return [{name: column[row] for name, column in self.columns.items()} for row in rows]
+
+    def rows_frame(self, rows):
+        """DataFrame di testo con le sole righe indicate (una copia, per esportare)"""
+        import pandas as pd
+        return pd.DataFrame(self.row_records(rows), columns=list(self.columns))
+
+    def normalize_rows(self, text_index=None):
+        """Valori distinti dei campi di testo normalizzati e colonne numeriche già convertite, una volta per i filtri"""
+        import pandas as pd
+        self.normalized = {}
+        self.text_index = {}
+        self.vocabularies = {}
+        for column in TEXT_FILTER_COLUMNS:
+            if column not in self.columns:
+                continue
+            codes, categories = self.columns[column].factorized()
+            folded = fold_column(pd.Series(categories, dtype=object))
+            self.normalized[column] = (folded, codes)
+            if text_index and column in text_index:
+                self.text_index[column] = TrigramIndex.from_arrays(text_index[column], self.group_count)
+            else:
+                self.text_index[column] = TrigramIndex.from_column(folded, codes, self.group_ids, self.group_count)
+
+        self.numeric = {}
+        self.numeric_index = {}
+        for key, (columns, allow_negative) in NUMERIC_FILTERS.items():
+            parsed = []
+            for column in columns:
+                if column in self.columns:
+                    self.numeric[column] = self.columns[column].numbers(allow_negative)
+                    parsed.append(self.numeric[column])
+            self.numeric_index[key] = NumericIndex(parsed, self.group_ids)
+
+        # Condizioni medie di ogni gruppo, per la ricerca dei più simili
+        self.conditions = {}
+        for key, (columns, _) in NUMERIC_FILTERS.items():
+            parsed = [self.numeric[column] for column in columns if column in self.numeric]
+            self.conditions[key] = self.group_mean(parsed)
+        self.conditions["umidita"] = humidity_fraction(self.conditions["umidita"])
+
+        self.scelta = self.classify_rows()
+        # Gruppi con almeno una riga di ciascuna scelta, per le stime del piano
+        self.scelta_groups_count = [int(np.count_nonzero(self.group_any(self.scelta.codes == code)))
+                                    for code in range(len(self.scelta.categories))]
+
+    def classify_rows(self):
+        """Scelta di ogni riga, classificando una volta ogni considerazione distinta"""
+        import pandas as pd
+        patterns = CONFIG["scelta_patterns"]
+        if COL_CONSIDERAZIONI not in self.columns:
+            return pd.Categorical.from_codes(np.full(len(self.group_ids), -1), categories=list(patterns))
+        codes, categories = self.columns[COL_CONSIDERAZIONI].factorized()
+        per_value = classify_scelte(pd.Series(categories, dtype=object), patterns)
+        return pd.Categorical.from_codes(per_value.codes[codes], categories=per_value.categories)
+
+    def memory_report(self):
+        """Byte occupati da ogni colonna e dagli indici, come (nome, tipo, byte)"""
+        report = [(name, column.kind, column.nbytes) for name, column in self.columns.items()]
+        report.append(("gruppi", "indice", self.group_ids.nbytes + self.group_starts.nbytes + self.group_ends.nbytes))
+        report.append(("valori numerici dei filtri", "indice",
+                       sum(values.nbytes for values in self.numeric.values())))
+        report.append(("indici numerici", "indice", sum(index.nbytes for index in self.numeric_index.values())))
+        report.append(("testo normalizzato", "indice",
+                       sum(int(folded.memory_usage(deep=True)) for folded, _ in self.normalized.values())))
+        report.append(("trigrammi", "indice", sum(index.nbytes for index in self.text_index.values())))
+        report.append(("vocabolari", "indice", sum(vocabulary.nbytes for vocabulary in self.vocabularies.values())))
+        report.append(("condizioni per gruppo", "indice", sum(values.nbytes for values in self.conditions.values())))
+        report.append(("scelte", "indice", self.scelta.codes.nbytes))
+        return report
+
+    def group_mean(self, columns):
+        """Media per gruppo dei valori presenti nelle colonne (NaN se il gruppo non ne ha)"""
+        sums = np.zeros(self.group_count)
+        counts = np.zeros(self.group_count)
+        if not self.group_count:
+            return sums
+        for values in columns:
+            valid = ~np.isnan(values)
+            sums += np.add.reduceat(np.where(valid, values, 0.0), self.group_starts)
+            counts += np.add.reduceat(valid.astype(np.float64), self.group_starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+
+    # Motore dei filtri
+
+    def group_any(self, row_mask):
+        """Un gruppo soddisfa il filtro se almeno una delle sue righe lo soddisfa"""
+        if not self.group_count:
+            return np.zeros(0, dtype=bool)
+        return np.logical_or.reduceat(row_mask, self.group_starts)
+
+    def rows_to_groups(self, rows):
+        group_mask = np.zeros(self.group_count, dtype=bool)
+        group_mask[self.group_ids[rows]] = True
+        return group_mask
+
+    def candidate_rows(self, candidates):
+        return np.flatnonzero(candidates[self.group_ids])
+
+    def no_groups(self, candidates):
+        return np.zeros(self.group_count, dtype=bool)
+
+    def text_groups(self, column, text, candidates):
+        if column not in self.normalized:
+            return self.no_groups(candidates)
+        folded, codes = self.normalized[column]
+        indexed = self.text_index[column].groups_containing(text)
+        if indexed is not None:
+            candidates = candidates & indexed
+            # Un solo trigramma presente nel gruppo è già una corrispondenza esatta
+            if len(text) == 3 or not candidates.any():
+                return candidates
+        elif candidates.all():
+            self.rows_scanned += len(codes)
+            hits = folded.str.contains(text, regex=False).to_numpy(dtype=bool)
+            return self.group_any(hits[codes])
+        # Conferma sulle righe dei soli gruppi ancora candidati, un confronto per valore distinto
+        rows = self.candidate_rows(candidates)
+        self.rows_scanned += len(rows)
+        row_codes = codes[rows]
+        needed = np.unique(row_codes)
+        hits = np.zeros(len(folded), dtype=bool)
+        hits[needed] = folded.take(needed).str.contains(text, regex=False).to_numpy(dtype=bool)
+        return self.rows_to_groups(rows[hits[row_codes]])
+
+    def suggest(self, field, text, limit=None):
+        """Parole proposte per il campo di testo field mentre l'utente scrive"""
+        column = TEXT_FILTERS.get(field)
+        if column not in self.text_index:
+            return []
+        if column not in self.vocabularies:
+            codes, categories = self.columns[column].factorized()
+            self.vocabularies[column] = WordVocabulary(categories, np.bincount(codes, minlength=len(categories)))
+        return self.vocabularies[column].suggest(text, limit or CONFIG["max_suggerimenti"])
+
+    def nearest_groups(self, conditions, candidates=None, k=None):
+        """Gruppi con le condizioni più vicine a quelle date, dal più simile.
+
+        conditions può contenere temp_aria, temp_neve e umidita (numeri) e tipo_neve
+        e meteo (testo). La distanza è la norma pesata delle differenze, calcolata
+        su tutti i gruppi insieme; restituisce (gruppi, distanze) dei primi k.
+        """
+        options = CONFIG["similarita"]
+        k = k or options["risultati"]
+        if candidates is None:
+            candidates = np.ones(self.group_count, dtype=bool)
+        squared = np.zeros(self.group_count)
+        for key, scale in options["scale"].items():
+            target = conditions.get(key)
+            if target is None:
+                continue
+            if key == "umidita":
+                target = float(humidity_fraction(np.float64(target)))
+            difference = (self.conditions[key] - target) / scale
+            squared += np.where(np.isnan(difference), options["penalita_mancante"] ** 2, difference ** 2)
+        everything = np.ones(self.group_count, dtype=bool)
+        for field in ("tipo_neve", "meteo"):
+            # Stessa sintassi dei filtri: "farin|umida", "!farin"
+            terms = [(negated, self.compile_term(field, body)[0])
+                     for negated, body in split_terms(fold_text(conditions.get(field) or ""))]
+            if terms:
+                matches = self.field_groups(terms, everything)
+                squared += np.where(matches, 0.0, options["penalita_testo"] ** 2)
+
+        # A parità di distanza vale la posizione nel foglio, come ORDER BY distanza, posizione in SQL
+        groups = np.flatnonzero(candidates)
+        groups = groups[np.argsort(squared[groups], kind='stable')[:k]]
+        return groups, np.sqrt(squared[groups])
+
+    def ranked_rows(self, groups):
+        """Righe dei gruppi nell'ordine dato"""
+        starts = self.group_starts[groups]
+        lengths = self.group_ends[groups] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(lengths.sum())
+
+    def query(self, query):
+        """Esegue una StruttureQuery e restituisce un QueryResult"""
+        group_mask = self.filter_groups(query.active_filters())
+        if query.simili:
+            # Le condizioni ordinano i gruppi, gli altri campi restano filtri
+            groups, distances = self.nearest_groups(query.conditions(), group_mask, query.k)
+            return QueryResult(groups, self.ranked_rows(groups), distances)
+        return QueryResult(np.flatnonzero(group_mask), self.group_rows(group_mask))
+
+    def explain(self, query):
+        """Piano dei filtri della query eseguito senza i risultati in cache: stime ed effettivi di ogni fase"""
+        self.filter_groups(query.active_filters(), use_cache=False)
+        return self.plan_report(self.last_plan)
+
+    def numeric_groups(self, key, interval, candidates):
+        rows = self.numeric_index[key].rows_matching(interval)
+        self.rows_scanned += len(rows)
+        return self.rows_to_groups(rows)
+
+    def scelta_groups(self, scelta, candidates):
+        if scelta not in self.scelta.categories:
+            return self.no_groups(candidates)
+        code = self.scelta.categories.get_loc(scelta)
+        rows = self.candidate_rows(candidates)
+        self.rows_scanned += len(rows)
+        return self.rows_to_groups(rows[self.scelta.codes[rows] == code])
+
+    def field_groups(self, terms, candidates):
+        """Gruppi candidati con almeno un termine cercato e nessuno di quelli esclusi.
+
+        terms sono coppie (escluso, maschera); ogni termine cercato si valuta solo
+        sui candidati che i precedenti non hanno già trovato.
+        """
+        wanted = [groups for negated, groups in terms if not negated]
+        if wanted:
+            found = np.zeros(self.group_count, dtype=bool)
+            for groups in wanted:
+                remaining = candidates & ~found
+                if not remaining.any():
+                    break
+                found |= groups(remaining)
+            candidates = candidates & found
+        for negated, groups in terms:
+            if negated and candidates.any():
+                candidates = candidates & ~groups(candidates)
+        return candidates
+
+    def compile_term(self, field, body):
+        """Maschera, gruppi stimati e tipo di costo di un termine di un filtro"""
+        if field in TEXT_FILTERS:
+            column = TEXT_FILTERS[field]
+            estimate = self.text_index[column].estimate_groups(body) if column in self.text_index else 0
+            kind = "testo" if len(body) >= 3 else "testo_breve"
+            return partial(self.text_groups, column, body), estimate, kind
+        if field in NUMERIC_FILTERS:
+            try:
+                interval = parse_numeric_query(body, CONFIG["tolleranze"][field])
+            except ValueError:
+                # Valore non numerico: nessun gruppo può corrispondere
+                return self.no_groups, 0, "numerico"
+            estimate = self.numeric_index[field].estimate_groups(
+                interval.low, interval.high, interval.inclusive or interval.target is not None)
+            return partial(self.numeric_groups, field, interval), estimate, "numerico"
+        categories = list(self.scelta.categories)
+        estimate = self.scelta_groups_count[categories.index(body)] if body in categories else 0
+        return partial(self.scelta_groups, body), estimate, "scelta"
+
+    def compile_filters(self, key):
+        """Piano dei filtri attivi (chiave normalizzata): una fase per campo, nell'ordine di esecuzione.
+
+        Le stime vengono dalle statistiche raccolte al caricamento (trigrammi, minimi
+        e massimi dei gruppi, scelte per gruppo). Si esegue prima la fase che scarta
+        più gruppi per unità di costo, così le successive lavorano su meno candidati.
+        Ogni fase riceve i gruppi ancora candidati e può limitarsi a quelli.
+        """
+        costs = CONFIG["costi_filtri"]
+        group_count = max(self.group_count, 1)
+        stages = []
+        for field, value in key:
+            if not value or not (field in TEXT_FILTERS or field in NUMERIC_FILTERS or field == "scelta"):
+                continue
+            terms = []
+            wanted = None
+            kept = 1.0
+            cost = 0.0
+            for negated, body in split_terms(value):
+                groups, estimate, kind = self.compile_term(field, body)
+                terms.append((negated, groups))
+                cost += costs[kind]
+                if negated:
+                    kept *= 1 - min(estimate, group_count) / group_count
+                else:
+                    wanted = (wanted or 0) + estimate
+            if wanted is not None:
+                kept *= min(wanted, group_count) / group_count
+            stages.append(PlanStage(field, value, partial(self.field_groups, terms), kept * group_count, cost))
+        return sorted(stages, key=lambda stage: (stage.estimate / group_count - 1) / stage.cost)
+
+    def narrowest_cached(self, key):
+        """Risultato in cache più piccolo che contiene per forza quello di key.
+
+        Restituisce la maschera di partenza e i campi già applicati.
+        """
+        best = None
+        for cached_key, cached_mask in self.result_cache.items():
+            if narrows(key, cached_key) and (best is None or cached_mask.sum() < best[1].sum()):
+                best = (cached_key, cached_mask)
+        if best is None:
+            return np.ones(self.group_count, dtype=bool), set()
+        cached_key, cached_mask = best
+        applied = {field for (field, value), (_, cached_value) in zip(key, cached_key) if value == cached_value}
+        return cached_mask.copy(), applied
+
+    def filter_groups(self, filters, use_cache=True):
+        """Maschera (sola lettura) dei gruppi che soddisfano tutti i filtri attivi.
+
+        Le fasi eseguite restano in last_plan; con use_cache=False si parte da tutti
+        i gruppi anche se il risultato è già in cache (per explain).
+        """
+        key = normalize_filters(filters)
+        if use_cache and key in self.result_cache:
+            self.result_cache.move_to_end(key)
+            self.last_plan = []
+            return self.result_cache[key]
+
+        # Un filtro più stretto di uno già calcolato parte dai gruppi di quello
+        if use_cache:
+            group_mask, applied = self.narrowest_cached(key)
+        else:
+            group_mask, applied = np.ones(self.group_count, dtype=bool), set()
+        lengths = self.group_ends - self.group_starts
+        from_cache = any(value for field, value in key if field in applied)
+        start = PlanStage("partenza", "cache" if from_cache else "", None, float(np.count_nonzero(group_mask)), 0.0,
+                          int(np.count_nonzero(group_mask)), int(lengths[group_mask].sum()))
+        plan = [start] + [stage for stage in self.compile_filters(key) if stage.name not in applied]
+        for stage in plan[1:]:
+            # Nessun candidato rimasto: le fasi successive non servono
+            if not group_mask.any():
+                break
+            with TRACER.span(f"filtro {stage.name}") as span:
+                scanned = self.rows_scanned
+                started = time.perf_counter()
+                group_mask &= stage.evaluate(group_mask)
+                stage.seconds = time.perf_counter() - started
+                stage.rows_scanned = span["righe_esaminate"] = self.rows_scanned - scanned
+            stage.groups = int(np.count_nonzero(group_mask))
+            stage.rows = int(lengths[group_mask].sum())
+        self.last_plan = plan
+
+        group_mask.flags.writeable = False
+        self.result_cache[key] = group_mask
+        while len(self.result_cache) > CONFIG["filter_cache_size"]:
+            self.result_cache.popitem(last=False)
+        return group_mask
+
+    def plan_report(self, plan):
+        """Righe di explain: per ogni fase gruppi e righe stimati ed effettivi.
+
+        Le stime si combinano supponendo i filtri indipendenti; una fase saltata
+        perché non restavano candidati ha gli effettivi a None.
+        """
+        group_count = max(self.group_count, 1)
+        rows_per_group = len(self.group_ids) / group_count
+        report = []
+        estimated = None
+        for stage in plan:
+            estimated = stage.estimate if estimated is None else estimated * stage.estimate / group_count
+            report.append({
+                "fase": f"{stage.name} {stage.value}".strip(),
+                "gruppi_stimati": round(estimated),
+                "gruppi": stage.groups,
+                "righe_stimate": round(estimated * rows_per_group),
+                "righe": stage.rows,
+                "righe_esaminate": stage.rows_scanned,
+                "ms": round(stage.seconds * 1000, 3),
+            })
+        return report
+
+    # Cache su disco
+
+    def validation_path(self):
+        return os.path.join(self.cache_dir, "validation.json")
+
+    def is_validated(self):
+        """True se questo file è già stato validato (stessa firma o stesso hash)"""
+        if not self.cache_dir or not os.path.exists(self.excel_path):
+            return False
+        try:
+            with open(self.validation_path(), 'r') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if record.get("sheet") != self.sheet_name:
+            return False
+        if record.get("signature") == list(self.file_signature()):
+            return True
+        return record.get("sha256") == self.file_hash()
+
+    def mark_validated(self):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.validation_path(), 'w') as f:
+            json.dump({
+                "sheet": self.sheet_name,
+                "signature": list(self.file_signature()),
+                "sha256": self.file_hash(),
+            }, f)
+
+    def read_cache_meta(self):
+        try:
+            with open(os.path.join(self.cache_dir, "meta.json"), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def has_valid_cache(self):
+        """True se la cache su disco corrisponde al file Excel attuale"""
+        if not self.cache_dir or not os.path.exists(self.excel_path):
+            return False
+        meta = self.read_cache_meta()
+        return bool(meta) and (
+            meta.get("format") == self.CACHE_FORMAT
+            and meta.get("sheet") == self.sheet_name
+            and meta.get("source_sha256") == self.file_hash()
+        )
+
+    def read_cache(self):
+        """Colonne compatte, id dei gruppi, numero di righe del foglio, impronte dei gruppi e
+        array degli indici dei trigrammi dalla cache.
+
+        Gli array sono mappati in sola lettura: le pagine si caricano quando servono.
+        """
+        meta = self.read_cache_meta()
+        data_dir = os.path.join(self.cache_dir, meta["dir"])
+        columns = {}
+        for entry in meta["columns"]:
+            arrays = {part: np.load(os.path.join(data_dir, file_name), mmap_mode='r')
+                      for part, file_name in entry["files"].items()}
+            columns[entry["name"]] = COLUMN_KINDS[entry["kind"]].from_arrays(arrays)
+        text_index = {}
+        for entry in meta["text_index"]:
+            text_index[entry["name"]] = {part: np.load(os.path.join(data_dir, file_name), mmap_mode='r')
+                                         for part, file_name in entry["files"].items()}
+        group_ids = np.load(os.path.join(data_dir, "group_id.npy"), mmap_mode='r')
+        group_hashes = np.load(os.path.join(data_dir, "group_hash.npy"), mmap_mode='r')
+        return columns, group_ids, meta["rows"], group_hashes, text_index
+
+    def write_cache(self, sha256):
+        """Scrive gli array in una cartella nuova e poi sostituisce meta.json, che la indica.
+
+        Un dataset già caricato può tenere mappati i file della cartella precedente
+        (su Windows non si possono cancellare né rinominare): quella cartella si
+        elimina quando non è più in uso, a una scrittura successiva.
+        """
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix="dati_", dir=self.cache_dir)
+
+        columns = []
+        for i, (name, column) in enumerate(self.columns.items()):
+            files = {}
+            for part, array in column.arrays().items():
+                file_name = f"col_{i:03d}_{part}.npy"
+                np.save(os.path.join(temp_dir, file_name), array)
+                files[part] = file_name
+            columns.append({"name": name, "kind": column.kind, "files": files})
+        text_index = []
+        for i, (name, index) in enumerate(self.text_index.items()):
+            files = {}
+            for part, array in index.arrays().items():
+                file_name = f"trigrammi_{i:03d}_{part}.npy"
+                np.save(os.path.join(temp_dir, file_name), array)
+                files[part] = file_name
+            text_index.append({"name": name, "files": files})
+        np.save(os.path.join(temp_dir, "group_id.npy"), self.group_ids)
+        np.save(os.path.join(temp_dir, "group_hash.npy"), self.group_hashes)
+
+        # meta.json per ultimo: una cache scritta a metà non risulta mai valida
+        meta_path = os.path.join(self.cache_dir, "meta.json")
+        with open(meta_path + ".tmp", 'w') as f:
+            json.dump({
+                "format": self.CACHE_FORMAT,
+                "sheet": self.sheet_name,
+                "source_sha256": sha256,
+                "rows": self.total_rows,
+                "dir": os.path.basename(temp_dir),
+                "columns": columns,
+                "text_index": text_index,
+            }, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+        # Cartelle e file .npy delle cache precedenti (anche del vecchio formato, senza sottocartella)
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_dir() and entry.name.startswith("dati_") and entry.path != temp_dir:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.is_file() and entry.name.endswith(".npy"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+# Riga di comando
+
+def read_queries(path):
+    """Query da un file .json (lista di oggetti), .jsonl (un oggetto per riga) o .csv ("-" = JSON da stdin)"""
+    if path == "-":
+        yield from json.load(sys.stdin)
+    elif path.lower().endswith(".csv"):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+    elif path.lower().endswith(".jsonl"):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
+
+def result_record(dataset, query_id, query, result):
+    """Risultato di una query come oggetto JSON: i gruppi con le loro righe e la scelta migliore"""
+    groups = []
+    for position, group_id in enumerate(result.groups):
+        start, end = dataset.group_range(group_id)
+        codes = dataset.scelta.codes[start:end]
+        chosen = codes[codes >= 0]
+        group = {
+            "gruppo": int(group_id),
+            "scelta": dataset.scelta.categories[chosen.min()] if len(chosen) else None,
+            "righe": dataset.row_records(range(start, end)),
+        }
+        if result.distances is not None:
+            group["distanza"] = round(float(result.distances[position]), 4)
+        groups.append(group)
+    query_fields = {name: value for name, value in asdict(query).items() if value not in ("", None, False)}
+    return {"id": query_id, "query": query_fields, "gruppi": groups}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Esegue molte ricerche su un solo caricamento del foglio; un risultato JSON per riga.")
+    parser.add_argument("excel", help="file STRUTTURE.xlsx")
+    parser.add_argument("queries", nargs="?", help="query in .json, .jsonl o .csv (\"-\" per JSON da stdin)")
+    parser.add_argument("--cache", help="cartella della cache del foglio (ad esempio quella dell'applicazione)")
+    parser.add_argument("--foglio", default="Foglio1", help="nome del foglio (predefinito: Foglio1)")
+    parser.add_argument("--memoria", action="store_true", help="stampa su stderr i byte occupati da colonne e indici")
+    parser.add_argument("--sqlite", metavar="DATABASE", help="interroga l'archivio SQLite (importato se serve) invece della memoria")
+    parser.add_argument("--explain", action="store_true",
+                        help="stampa su stderr il piano di ogni query, con righe stimate ed effettive per fase")
+    args = parser.parse_args(argv)
+    if not args.queries and not args.memoria:
+        parser.error("indicare il file delle query o --memoria")
+
+    if args.sqlite:
+        from strutture_sql import StruttureStore
+        dataset = StruttureStore(args.excel, args.cache, args.sqlite, args.foglio)
+    else:
+        dataset = StruttureDataset(args.excel, args.cache, args.foglio)
+    try:
+        dataset.load()
+    except Exception as e:
+        print(f"Errore caricamento {args.excel}: {str(e)}", file=sys.stderr)
+        return 1
+    if args.memoria:
+        print(format_memory_report(dataset.memory_report()), file=sys.stderr)
+    if not args.queries:
+        return 0
+
+    for number, data in enumerate(read_queries(args.queries), 1):
+        data = dict(data)
+        query_id = data.pop("id", number)
+        try:
+            query = StruttureQuery.from_dict(data)
+            if args.explain:
+                print(f"Query {query_id}:\n{format_explain(dataset.explain(query))}", file=sys.stderr)
+            record = result_record(dataset, query_id, query, dataset.query(query))
+        except (ValueError, TypeError) as e:
+            record = {"id": query_id, "errore": str(e)}
+        print(json.dumps(record), flush=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Aggiornamenti differenziali del database: patch a livello di gruppo tra due versioni del foglio.
+
+Una patch descrive la nuova versione come sequenza di gruppi copiati dalla
+versione precedente (intervalli di posizioni) e di gruppi aggiunti o modificati
+(le loro righe), più l'impronta del risultato per verificarne l'applicazione e
+le righe vuote prima di ogni gruppo, per riscrivere il foglio con la stessa
+disposizione (e lo stesso numero di righe).
+Il manifest (latest.json) la pubblica in "deltas":
+
+    {"from": "<sha256 vecchio>", "to": "<sha256 nuovo>", "url": "...", "sha256": "<sha256 patch>", "size": 1234}
+
+Per generarla (stampa la voce del manifest da completare con l'URL):
+
+    python strutture_delta.py VECCHIO.xlsx NUOVO.xlsx patch.json
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import numpy as np
+from datetime import datetime
+
+from strutture_dati import NUMBER_PATTERN, StruttureDataset, cell_text, group_ids_from_blank
+
+PATCH_FORMAT = 1
+
+def groups_fingerprint(groups):
+    """sha256 del contenuto di tutti i gruppi, indipendente dal formato del file"""
+    digest = hashlib.sha256()
+    for rows in groups:
+        digest.update(json.dumps(rows, ensure_ascii=False).encode('utf-8'))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+def blank_rows_before(group_ids):
+    """Righe vuote prima di ogni gruppo, dato l'id del gruppo di ogni riga del foglio (-1 per le vuote)"""
+    in_group = np.asarray(group_ids) >= 0
+    starts = np.flatnonzero(in_group & ~np.r_[False, in_group[:-1]])
+    ends = np.flatnonzero(in_group & ~np.r_[in_group[1:], False]) + 1
+    return (starts - np.r_[0, ends[:-1]]).tolist()
+
+def make_patch(old, new, old_sha256, new_sha256, blank_rows=None):
+    """Patch che trasforma i gruppi del dataset old in quelli di new (blank_rows: disposizione del nuovo foglio)"""
+    if list(old.columns) != list(new.columns):
+        raise ValueError("Intestazione cambiata: serve il file completo")
+    old_positions = new.match_groups(old)
+    new_groups = new.group_lists()
+    operations = []
+    for position, old_position in enumerate(old_positions.tolist()):
+        last = operations[-1] if operations else None
+        if old_position < 0:
+            if last and last[0] == "add":
+                last[1].append(new_groups[position])
+            else:
+                operations.append(["add", [new_groups[position]]])
+        elif last and last[0] == "copy" and last[1] + last[2] == old_position:
+            last[2] += 1
+        else:
+            operations.append(["copy", old_position, 1])
+    patch = {
+        "format": PATCH_FORMAT,
+        "from": old_sha256,
+        "to": new_sha256,
+        "sheet": new.sheet_name,
+        "header": list(new.columns),
+        "groups": operations,
+        "fingerprint": groups_fingerprint(new_groups),
+    }
+    if blank_rows is not None:
+        patch["blank_rows"] = list(blank_rows)
+    return patch
+
+def apply_patch(groups, header, patch):
+    """Gruppi della nuova versione dai gruppi della precedente; ValueError se la patch non corrisponde"""
+    if patch.get("format") != PATCH_FORMAT:
+        raise ValueError(f"Formato patch non supportato: {patch.get('format')}")
+    if patch.get("header") != header:
+        raise ValueError("Intestazione della patch diversa da quella locale")
+    result = []
+    for operation in patch["groups"]:
+        if operation[0] == "copy":
+            _, start, count = operation
+            if start < 0 or start + count > len(groups):
+                raise ValueError("Patch non valida: gruppi copiati fuori intervallo")
+            result.extend(groups[start:start + count])
+        elif operation[0] == "add":
+            result.extend(operation[1])
+        else:
+            raise ValueError(f"Operazione sconosciuta nella patch: {operation[0]}")
+    if groups_fingerprint(result) != patch["fingerprint"]:
+        raise ValueError("Patch non valida: il risultato non corrisponde all'impronta")
+    if "blank_rows" in patch and len(patch["blank_rows"]) != len(result):
+        raise ValueError("Patch non valida: righe vuote non corrispondenti ai gruppi")
+    return result
+
+def sheet_value(text):
+    """Valore da scrivere nella cella: numeri e date tornano tali se rileggendoli il testo è identico"""
+    if not text:
+        return None
+    if NUMBER_PATTERN.match(text):
+        value = float(text.replace(',', '.'))
+        return value if cell_text(value) == text else text
+    try:
+        value = datetime.fromisoformat(text)
+    except ValueError:
+        return text
+    return value if cell_text(value) == text else text
+
+def sheet_rows(groups, blank_rows=None):
+    """Righe del foglio in ordine, None per quelle vuote: blank_rows[i] righe vuote prima del
+    gruppo i (dalla patch), altrimenti una riga vuota tra un gruppo e l'altro"""
+    for number, rows in enumerate(groups):
+        gap = blank_rows[number] if blank_rows is not None else int(number > 0)
+        yield from [None] * gap
+        yield from rows
+
+def write_sheet(path, sheet_name, header, groups, blank_rows=None):
+    """Scrive il foglio: intestazione e gruppi con le righe vuote di sheet_rows (openpyxl write_only)"""
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(header)
+    for row in sheet_rows(groups, blank_rows):
+        sheet.append([] if row is None else [sheet_value(text) for text in row])
+    workbook.save(path)
+
+def dataset_from_groups(excel_path, cache_dir, sheet_name, header, groups, previous=None, blank_rows=None):
+    """Dataset con i gruppi dati, come se fosse stato letto dal foglio scritto da write_sheet"""
+    import pandas as pd
+    rows = []
+    blank = []
+    for row in sheet_rows(groups, blank_rows):
+        rows.append([""] * len(header) if row is None else row)
+        blank.append(row is None)
+    dataset = StruttureDataset(excel_path, cache_dir, sheet_name)
+    df = pd.DataFrame(rows, columns=header, dtype=object).astype(str) if rows else pd.DataFrame(columns=header, dtype=str)
+    dataset.set_data(df, group_ids_from_blank(np.asarray(blank, dtype=bool)), previous)
+    return dataset
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera la patch tra due versioni del foglio STRUTTURE.")
+    parser.add_argument("vecchio", help="versione precedente (quella che hanno i client)")
+    parser.add_argument("nuovo", help="versione da pubblicare")
+    parser.add_argument("patch", help="file JSON della patch da scrivere")
+    parser.add_argument("--foglio", default="Foglio1", help="nome del foglio (predefinito: Foglio1)")
+    args = parser.parse_args(argv)
+
+    try:
+        old = StruttureDataset(args.vecchio, None, args.foglio)
+        old.load()
+        # Il nuovo foglio si legge riga per riga per conoscerne le righe vuote
+        new = StruttureDataset(args.nuovo, None, args.foglio)
+        df, group_ids = new.ingest()
+        new.set_data(df, group_ids)
+        new.sha256 = new.file_hash()
+        patch = make_patch(old, new, old.sha256, new.sha256, blank_rows_before(group_ids))
+    except Exception as e:
+        print(f"Errore generazione patch: {str(e)}", file=sys.stderr)
+        return 1
+    data = json.dumps(patch, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+    with open(args.patch, 'wb') as f:
+        f.write(data)
+    print(json.dumps({
+        "from": old.sha256,
+        "to": new.sha256,
+        "url": os.path.basename(args.patch),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size": len(data),
+    }, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,482 @@
+"""Archivio SQLite delle strutture, alternativo al foglio tenuto in memoria.
+
+Per gli archivi di più stagioni il foglio viene importato in un database locale:
+una tabella dei gruppi, una delle righe con indici B-tree su temperature e
+umidità e un indice FTS5 (trigrammi) sui campi di testo. L'importazione è
+incrementale: i gruppi si riconoscono dall'hash del contenuto e si scrivono
+solo quelli nuovi o modificati. I filtri diventano un'unica query SQL.
+
+    python strutture_sql.py STRUTTURE.xlsx strutture.sqlite
+"""
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+import numpy as np
+from contextlib import closing, contextmanager
+
+from strutture_dati import (
+    CONFIG, COL_CONSIDERAZIONI, NUMERIC_FILTERS, TEXT_FILTERS, TRACER,
+    QueryResult, StruttureDataset, WordVocabulary, classify_scelte, fold_column, fold_text,
+    humidity_fraction, join_terms, make_column, normalize_filters, parse_numeric_column, parse_numeric_query,
+    split_terms
+)
+
+# Colonne numeriche della tabella righe per ogni filtro, nell'ordine delle colonne del foglio
+NUMERIC_SQL_COLUMNS = {
+    key: [f"{key}_{suffix}" for suffix in ("inizio", "fine")[:len(columns)]]
+    for key, (columns, _) in NUMERIC_FILTERS.items()
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (chiave TEXT PRIMARY KEY, valore TEXT);
+CREATE TABLE IF NOT EXISTS gruppi (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    posizione INTEGER NOT NULL,
+    temp_aria REAL,
+    temp_neve REAL,
+    umidita REAL
+);
+CREATE INDEX IF NOT EXISTS gruppi_hash ON gruppi(hash);
+CREATE INDEX IF NOT EXISTS gruppi_posizione ON gruppi(posizione);
+CREATE TABLE IF NOT EXISTS righe (
+    id INTEGER PRIMARY KEY,
+    gruppo INTEGER NOT NULL REFERENCES gruppi(id),
+    ordine INTEGER NOT NULL,
+    celle TEXT NOT NULL,
+    {numeric},
+    scelta INTEGER
+);
+CREATE INDEX IF NOT EXISTS righe_gruppo ON righe(gruppo, ordine);
+CREATE INDEX IF NOT EXISTS righe_scelta ON righe(scelta, gruppo);
+{indexes}
+CREATE VIRTUAL TABLE IF NOT EXISTS testo USING fts5({text}, tokenize='trigram');
+""".format(
+    numeric=",\n    ".join(f"{name} REAL" for names in NUMERIC_SQL_COLUMNS.values() for name in names),
+    # Indici coprenti: l'intervallo si risolve senza leggere le righe
+    indexes="\n".join(f"CREATE INDEX IF NOT EXISTS righe_{name} ON righe({name}, gruppo);"
+                      for names in NUMERIC_SQL_COLUMNS.values() for name in names),
+    text=", ".join(TEXT_FILTERS),
+)
+
+def group_hash(rows):
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def like_pattern(text):
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+class StruttureStore(StruttureDataset):
+    """Foglio STRUTTURE importato in un database SQLite, interrogato con una query per ricerca.
+
+    Ha la stessa interfaccia di StruttureDataset per l'interfaccia e la riga di
+    comando, ma in memoria restano solo le righe dell'ultimo risultato: columns,
+    scelta e gli offset dei gruppi si riferiscono a quelle.
+    """
+
+    FORMAT = 1
+
+    def __init__(self, excel_path, cache_dir=None, db_path=None, sheet_name="Foglio1"):
+        super().__init__(excel_path, cache_dir, sheet_name)
+        self.db_path = db_path or os.path.splitext(excel_path)[0] + ".sqlite"
+        self.header = []
+        self.group_positions = {}
+        self.vocabularies = {}
+
+    @contextmanager
+    def connect(self):
+        """Connessione per una sola operazione: il caricamento avviene in un altro thread"""
+        with closing(sqlite3.connect(self.db_path)) as db:
+            yield db
+
+    def read_info(self, db):
+        try:
+            return {key: json.loads(value) for key, value in db.execute("SELECT chiave, valore FROM info")}
+        except sqlite3.OperationalError:
+            return {}
+
+    def settings(self, header):
+        """Ciò che determina il contenuto delle tabelle oltre alle celle: se cambia si reimporta tutto"""
+        return {"formato": self.FORMAT, "foglio": self.sheet_name, "intestazione": header,
+                "scelte": CONFIG["scelta_patterns"]}
+
+    def has_valid_cache(self):
+        """True se il database contiene già il file Excel attuale"""
+        if not os.path.exists(self.db_path) or not os.path.exists(self.excel_path):
+            return False
+        with self.connect() as db:
+            info = self.read_info(db)
+        return info.get("source_sha256") == self.file_hash()
+
+    def load(self, progress=None, on_preview=None):
+        """Importa nel database i gruppi nuovi o modificati del foglio, se il file è cambiato"""
+        if progress:
+            progress("parse")
+        signature = self.file_signature()
+        sha256 = self.file_hash()
+
+        with self.connect() as db:
+            info = self.read_info(db)
+        self.groups_changed = 0
+        if info.get("source_sha256") != sha256:
+            with TRACER.span("lettura foglio") as span:
+                df, group_ids = self.ingest(progress, on_preview)
+                span["righe"] = len(df)
+            with TRACER.span("importazione") as span:
+                summary = self.import_sheet(df, group_ids, sha256)
+                span.update(summary)
+            # Gruppi nuovi o modificati: quelli scritti nel database
+            self.groups_changed = summary["gruppi_nuovi"]
+            with self.connect() as db:
+                info = self.read_info(db)
+
+        self.header = info["intestazione"]
+        self.total_rows = info["righe_foglio"]
+        self.vocabularies = {}
+        self.result_cache.clear()
+        self.set_result([], [], [], [], [])
+        self.signature = signature
+        self.sha256 = sha256
+        if progress:
+            progress("parse", self.total_rows, self.total_rows)
+
+    def reloaded(self, progress=None):
+        """Archivio aggiornato dal file cambiato: l'importazione scrive solo i gruppi cambiati"""
+        store = StruttureStore(self.excel_path, self.cache_dir, self.db_path, self.sheet_name)
+        store.load(progress)
+        return store
+
+    def import_sheet(self, df, group_ids, sha256):
+        """Allinea il database ai gruppi di df: restano quelli invariati, si scrivono solo le differenze"""
+        header = [str(column) for column in df.columns]
+        settings = self.settings(header)
+        in_group = group_ids >= 0
+        cells = df.to_numpy(dtype=object)[in_group]
+        ids = group_ids[in_group]
+        boundaries = np.flatnonzero(np.diff(ids)) + 1
+        starts = np.r_[0, boundaries] if len(ids) else np.empty(0, dtype=np.intp)
+        ends = np.r_[boundaries, len(ids)] if len(ids) else np.empty(0, dtype=np.intp)
+        groups = [cells[start:end].tolist() for start, end in zip(starts, ends)]
+        hashes = [group_hash(rows) for rows in groups]
+
+        with self.connect() as db, db:
+            db.executescript(SCHEMA)
+            info = self.read_info(db)
+            if any(info.get(key) != value for key, value in settings.items()):
+                # Struttura del foglio o regole delle scelte diverse: nessun gruppo è riutilizzabile
+                db.execute("DELETE FROM testo")
+                db.execute("DELETE FROM righe")
+                db.execute("DELETE FROM gruppi")
+
+            existing = {}
+            for group_id, digest in db.execute("SELECT id, hash FROM gruppi ORDER BY posizione"):
+                existing.setdefault(digest, []).append(group_id)
+            kept = []
+            new = []
+            for position, digest in enumerate(hashes):
+                if existing.get(digest):
+                    kept.append((position, existing[digest].pop(0)))
+                else:
+                    new.append(position)
+            removed = [group_id for group_ids_left in existing.values() for group_id in group_ids_left]
+
+            if removed:
+                db.execute("CREATE TEMP TABLE rimossi (id INTEGER PRIMARY KEY)")
+                db.executemany("INSERT INTO rimossi VALUES (?)", [(group_id,) for group_id in removed])
+                db.execute("DELETE FROM testo WHERE rowid IN "
+                           "(SELECT id FROM righe WHERE gruppo IN (SELECT id FROM rimossi))")
+                db.execute("DELETE FROM righe WHERE gruppo IN (SELECT id FROM rimossi)")
+                db.execute("DELETE FROM gruppi WHERE id IN (SELECT id FROM rimossi)")
+                db.execute("DROP TABLE rimossi")
+            db.executemany("UPDATE gruppi SET posizione = ? WHERE id = ?", kept)
+
+            if new:
+                self.insert_groups(db, header, [groups[position] for position in new],
+                                   [hashes[position] for position in new], new)
+            if new or removed:
+                # Statistiche degli indici per il pianificatore, che sceglie da quale filtro partire
+                db.execute("ANALYZE")
+
+            for key, value in dict(settings, source_sha256=sha256, righe_foglio=len(df)).items():
+                db.execute("INSERT OR REPLACE INTO info VALUES (?, ?)", (key, json.dumps(value)))
+
+        return {"gruppi_nuovi": len(new), "gruppi_rimossi": len(removed), "gruppi_invariati": len(kept)}
+
+    def insert_groups(self, db, header, groups, hashes, positions):
+        """Scrive gruppi nuovi con righe, valori numerici, scelte e testo normalizzato per l'FTS"""
+        import pandas as pd
+        lengths = np.array([len(rows) for rows in groups])
+        starts = np.r_[0, np.cumsum(lengths)[:-1]]
+        frame = pd.DataFrame([row for rows in groups for row in rows], columns=header)
+        row_count = len(frame)
+        missing = pd.Series([""] * row_count, dtype=object)
+
+        numeric = {}
+        means = {}
+        for key, (columns, allow_negative) in NUMERIC_FILTERS.items():
+            parsed = [parse_numeric_column(frame[column], allow_negative) if column in frame
+                      else np.full(row_count, np.nan) for column in columns]
+            numeric.update(zip(NUMERIC_SQL_COLUMNS[key], parsed))
+            # Media per gruppo dei valori presenti, come per la ricerca dei più simili in memoria
+            stacked = np.vstack(parsed)
+            valid = ~np.isnan(stacked)
+            sums = np.add.reduceat(np.where(valid, stacked, 0.0).sum(axis=0), starts)
+            counts = np.add.reduceat(valid.sum(axis=0).astype(np.float64), starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means[key] = sums / counts
+        means["umidita"] = humidity_fraction(means["umidita"])
+
+        considerazioni = frame[COL_CONSIDERAZIONI] if COL_CONSIDERAZIONI in frame else missing
+        scelte = classify_scelte(considerazioni, CONFIG["scelta_patterns"]).codes
+        folded = {field: fold_column(frame[column] if column in frame else missing).tolist()
+                  for field, column in TEXT_FILTERS.items()}
+
+        first_id = db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM gruppi").fetchone()[0]
+        group_ids = np.arange(first_id, first_id + len(groups))
+        db.executemany(
+            "INSERT INTO gruppi (id, hash, posizione, temp_aria, temp_neve, umidita) VALUES (?, ?, ?, ?, ?, ?)",
+            [(int(group_id), digest, position, *(None if np.isnan(means[key][i]) else float(means[key][i])
+                                                  for key in NUMERIC_FILTERS))
+             for i, (group_id, digest, position) in enumerate(zip(group_ids, hashes, positions))])
+
+        first_row = db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM righe").fetchone()[0]
+        row_groups = np.repeat(group_ids, lengths)
+        row_order = np.arange(row_count) - np.repeat(starts, lengths)
+        numeric_names = list(numeric)
+        db.executemany(
+            f"INSERT INTO righe (id, gruppo, ordine, celle, {', '.join(numeric_names)}, scelta) "
+            f"VALUES ({', '.join('?' * (len(numeric_names) + 5))})",
+            [(first_row + row, int(row_groups[row]), int(row_order[row]),
+              json.dumps(cells, ensure_ascii=False),
+              *(None if np.isnan(numeric[name][row]) else float(numeric[name][row]) for name in numeric_names),
+              None if scelte[row] < 0 else int(scelte[row]))
+             for row, cells in enumerate(frame.itertuples(index=False, name=None))])
+        db.executemany(
+            f"INSERT INTO testo (rowid, {', '.join(TEXT_FILTERS)}) VALUES ({', '.join('?' * (len(TEXT_FILTERS) + 1))})",
+            [(first_row + row, *(folded[field][row] for field in TEXT_FILTERS)) for row in range(row_count)])
+
+    # Ricerca
+
+    def text_clause(self, field, text):
+        """Sottoquery dei gruppi con una riga che contiene text nel campo field"""
+        if len(text) >= 3:
+            # Con il tokenizer trigram una frase è una ricerca per sottostringa
+            return ("SELECT righe.gruppo FROM testo JOIN righe ON righe.id = testo.rowid WHERE testo MATCH ?",
+                    [f'{field} : "{text.replace(chr(34), chr(34) * 2)}"'])
+        return (f"SELECT righe.gruppo FROM testo JOIN righe ON righe.id = testo.rowid "
+                f"WHERE testo.{field} LIKE ? ESCAPE '\\'", [like_pattern(text)])
+
+    def numeric_clause(self, field, body):
+        """Sottoquery dei gruppi con un valore del campo numerico nell'intervallo del termine; None se non numerico"""
+        try:
+            interval = parse_numeric_query(body, CONFIG["tolleranze"][field])
+        except ValueError:
+            return None
+        # Con una tolleranza i limiti (allargati) servono all'indice, poi decide ABS come in memoria
+        near = interval.target is not None
+        above, below = (">=", "<=") if interval.inclusive or near else (">", "<")
+        selects = []
+        params = []
+        for name in NUMERIC_SQL_COLUMNS[field]:
+            # Un estremo infinito (">0", "<5") non diventa una condizione
+            conditions = [(f"{name} {above} ?", [interval.low]), (f"{name} {below} ?", [interval.high])]
+            conditions = [(condition, values) for condition, values in conditions if np.isfinite(values[0])]
+            if near:
+                conditions.append((f"ABS({name} - ?) {'<=' if interval.inclusive else '<'} ?",
+                                   [interval.target, interval.tolerance]))
+            where = " AND ".join(condition for condition, _ in conditions) or f"{name} IS NOT NULL"
+            selects.append(f"SELECT gruppo FROM righe WHERE {where}")
+            params.extend(value for _, values in conditions for value in values)
+        return " UNION ALL ".join(selects), params
+
+    def term_clause(self, field, body):
+        """Sottoquery (e parametri) dei gruppi che soddisfano un termine; None se nessun gruppo può farlo"""
+        if field in TEXT_FILTERS:
+            return self.text_clause(field, body)
+        if field in NUMERIC_FILTERS:
+            return self.numeric_clause(field, body)
+        if body not in CONFIG["scelta_patterns"]:
+            return None
+        return "SELECT gruppo FROM righe WHERE scelta = ?", [list(CONFIG["scelta_patterns"]).index(body)]
+
+    def field_clause(self, field, value):
+        """Condizioni SQL (e parametri) di un campo: i termini cercati diventano un'unione,
+        quelli esclusi un NOT IN"""
+        clauses = []
+        params = []
+        wanted = []
+        wanted_params = []
+        has_wanted = False
+        for negated, body in split_terms(value):
+            has_wanted = has_wanted or not negated
+            clause = self.term_clause(field, body)
+            if clause is None:
+                # Termine che nessun gruppo può soddisfare (valore non numerico o scelta sconosciuta)
+                continue
+            subquery, subparams = clause
+            if negated:
+                clauses.append(f"g.id NOT IN ({subquery})")
+                params.extend(subparams)
+            else:
+                wanted.append(subquery)
+                wanted_params.extend(subparams)
+        if wanted:
+            clauses.append(f"g.id IN ({' UNION '.join(wanted)})")
+            params.extend(wanted_params)
+        elif has_wanted:
+            clauses.append("0")
+        return " AND ".join(clauses) or "1", params
+
+    def where_clause(self, key):
+        """Condizioni SQL (e parametri) dei filtri attivi nella chiave normalizzata.
+
+        L'ordine di esecuzione lo sceglie SQLite con le statistiche di ANALYZE.
+        """
+        clauses = []
+        params = []
+        for field, value in key:
+            if not value or not (field in TEXT_FILTERS or field in NUMERIC_FILTERS or field == "scelta"):
+                continue
+            clause, clause_params = self.field_clause(field, value)
+            clauses.append(clause)
+            params.extend(clause_params)
+        return " AND ".join(clauses) or "1", params
+
+    def distance_expression(self, conditions):
+        """Quadrato della distanza di un gruppo dalle condizioni, come in nearest_groups"""
+        options = CONFIG["similarita"]
+        terms = []
+        params = []
+        for key, scale in options["scale"].items():
+            target = conditions.get(key)
+            if target is None:
+                continue
+            if key == "umidita":
+                target = float(humidity_fraction(np.float64(target)))
+            terms.append(f"CASE WHEN g.{key} IS NULL THEN ? ELSE ((g.{key} - ?) / ?) * ((g.{key} - ?) / ?) END")
+            params.extend([options["penalita_mancante"] ** 2, target, scale, target, scale])
+        for field in ("tipo_neve", "meteo"):
+            # Stessa sintassi dei filtri: "farin|umida", "!farin"
+            value = join_terms(split_terms(fold_text(conditions.get(field) or "")))
+            if value:
+                clause, clause_params = self.field_clause(field, value)
+                terms.append(f"CASE WHEN {clause} THEN 0 ELSE ? END")
+                params.extend(clause_params + [options["penalita_testo"] ** 2])
+        return " + ".join(terms) or "0", params
+
+    def query_sql(self, query):
+        """Un'unica query SQL: gruppi trovati (con la distanza se per simili) e le loro righe in ordine"""
+        where, params = self.where_clause(normalize_filters(query.active_filters()))
+        if query.simili:
+            distance, distance_params = self.distance_expression(query.conditions())
+            selected = (f"SELECT g.id, g.hash, g.posizione, {distance} AS distanza FROM gruppi g WHERE {where} "
+                        f"ORDER BY distanza, g.posizione LIMIT ?")
+            params = distance_params + params + [query.k or CONFIG["similarita"]["risultati"]]
+        else:
+            selected = f"SELECT g.id, g.hash, g.posizione, NULL AS distanza FROM gruppi g WHERE {where}"
+        sql = (f"WITH trovati AS ({selected}) "
+               f"SELECT t.posizione, t.hash, t.distanza, r.celle, r.scelta FROM trovati t JOIN righe r ON r.gruppo = t.id "
+               f"ORDER BY t.distanza, t.posizione, r.ordine")
+        return sql, params
+
+    def query(self, query):
+        """Esegue una StruttureQuery sul database; le righe trovate diventano columns e scelta"""
+        sql, params = self.query_sql(query)
+        with self.connect() as db:
+            records = db.execute(sql, params).fetchall()
+        self.rows_scanned += len(records)
+        group_ids, hashes, distances, cells, scelte = zip(*records) if records else ([], [], [], [], [])
+        self.set_result(group_ids, hashes, distances, cells, scelte)
+        groups = np.fromiter(self.group_positions, dtype=np.int64, count=len(self.group_positions))
+        if query.simili:
+            first = np.asarray(self.group_starts, dtype=np.intp)
+            squared = np.asarray(distances, dtype=np.float64)[first] if len(first) else np.empty(0)
+            return QueryResult(groups, np.arange(len(records)), np.sqrt(squared))
+        return QueryResult(groups, np.arange(len(records)))
+
+    def explain(self, query):
+        """Piano scelto da SQLite per la query (EXPLAIN QUERY PLAN): SQLite non espone stime né conteggi per fase"""
+        sql, params = self.query_sql(query)
+        with self.connect() as db:
+            steps = db.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        # Le fasi formano un albero: il rientro mostra da quale fase dipendono
+        depth = {0: -1}
+        report = []
+        for step_id, parent, _, detail in steps:
+            depth[step_id] = depth.get(parent, -1) + 1
+            report.append({"fase": "  " * depth[step_id] + detail})
+        return report
+
+    def set_result(self, group_ids, hashes, distances, cells, scelte):
+        """Righe dell'ultimo risultato in forma compatta, con i gruppi come intervalli di offset.
+
+        I gruppi si identificano con la posizione nel foglio, come in memoria; le loro
+        impronte permettono di ritrovare le righe selezionate dopo un ricaricamento."""
+        import pandas as pd
+        rows = [json.loads(text) for text in cells]
+        self.columns = {name: make_column(np.array([row[i] for row in rows], dtype=object))
+                        for i, name in enumerate(self.header)}
+        codes = np.array([-1 if scelta is None else scelta for scelta in scelte], dtype=np.int8)
+        self.scelta = pd.Categorical.from_codes(codes, categories=list(CONFIG["scelta_patterns"]))
+        group_ids = np.asarray(group_ids, dtype=np.int64)
+        boundaries = np.flatnonzero(np.diff(group_ids)) + 1
+        self.group_starts = np.r_[0, boundaries] if len(group_ids) else np.empty(0, dtype=np.intp)
+        self.group_ends = np.r_[boundaries, len(group_ids)] if len(group_ids) else np.empty(0, dtype=np.intp)
+        self.group_positions = {int(group_ids[start]): i for i, start in enumerate(self.group_starts)}
+        self.group_hashes = [bytes.fromhex(hashes[start]) for start in self.group_starts]
+        self.group_ids = np.repeat(np.arange(len(self.group_starts)), self.group_ends - self.group_starts)
+
+    @property
+    def group_count(self):
+        with self.connect() as db:
+            return db.execute("SELECT COUNT(*) FROM gruppi").fetchone()[0]
+
+    def group_range(self, group_id):
+        position = self.group_positions[group_id]
+        return self.group_starts[position], self.group_ends[position]
+
+    def suggest(self, field, text, limit=None):
+        """Parole proposte per il campo di testo field, dal vocabolario costruito alla prima richiesta"""
+        column = TEXT_FILTERS.get(field)
+        if column not in self.header:
+            return []
+        if field not in self.vocabularies:
+            with self.connect() as db:
+                values = db.execute(
+                    "SELECT json_extract(celle, ?) AS valore, COUNT(*) FROM righe GROUP BY valore",
+                    [f"$[{self.header.index(column)}]"]).fetchall()
+            self.vocabularies[field] = WordVocabulary([value or "" for value, _ in values],
+                                                      [count for _, count in values])
+        return self.vocabularies[field].suggest(text, limit or CONFIG["max_suggerimenti"])
+
+    def memory_report(self):
+        """Dimensione del database su disco e righe dell'ultimo risultato in memoria"""
+        report = [(name, column.kind, column.nbytes) for name, column in self.columns.items()]
+        report.append(("database", "sqlite", os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0))
+        report.append(("vocabolari", "indice", sum(vocabulary.nbytes for vocabulary in self.vocabularies.values())))
+        return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa il foglio STRUTTURE in un database SQLite.")
+    parser.add_argument("excel", help="file STRUTTURE.xlsx")
+    parser.add_argument("database", nargs="?", help="file del database (predefinito: accanto al foglio)")
+    parser.add_argument("--foglio", default="Foglio1", help="nome del foglio (predefinito: Foglio1)")
+    args = parser.parse_args(argv)
+
+    store = StruttureStore(args.excel, None, args.database, args.foglio)
+    TRACER.enabled = True
+    try:
+        store.load()
+    except Exception as e:
+        print(f"Errore importazione {args.excel}: {str(e)}", file=sys.stderr)
+        return 1
+    imported = [event["args"] for event in TRACER.events if event["name"] == "importazione"]
+    summary = imported[0] if imported else {"gruppi_nuovi": 0, "gruppi_rimossi": 0, "gruppi_invariati": store.group_count}
+    print(f"{store.db_path}: {summary['gruppi_nuovi']} gruppi nuovi, {summary['gruppi_rimossi']} rimossi, "
+          f"{summary['gruppi_invariati']} invariati")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())